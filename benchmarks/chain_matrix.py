@@ -0,0 +1,93 @@
+"""Time building the ChainMatrix of chains of a few hundred systems.
+
+A tree is a chain the way we usually map one, every new wormhole leads to
+a new system. A bushy chain has as many wormholes again between systems
+already in it, so its breadth first search settles in fewer steps.
+
+Run with `python benchmarks/chain_matrix.py [systems] [runs]` in a
+development environment, needs `unchaind[numpy]`."""
+import random
+import statistics
+import sys
+import time
+
+from typing import List
+
+import unchaind.static as static
+
+from unchaind.exception import ConnectionDuplicate
+from unchaind.path import ChainMatrix
+from unchaind.universe import Universe, Connection, State, System
+
+
+def tree(systems: List[System]) -> Universe:
+    """A chain where every system hangs off one we mapped before it."""
+    universe = Universe.from_empty_sync()
+
+    for n, system in enumerate(systems[1:], start=1):
+        universe.connect_sync(
+            Connection(
+                systems[random.randrange(n)], system, State(State.WORMHOLE)
+            )
+        )
+
+    return universe
+
+
+def bushy(systems: List[System]) -> Universe:
+    """A tree with as many wormholes again between random systems of it."""
+    universe = tree(systems)
+
+    for left, right in zip(
+        random.sample(systems, len(systems)),
+        random.sample(systems, len(systems)),
+    ):
+        if left == right:
+            continue
+
+        try:
+            universe.connect_sync(
+                Connection(left, right, State(State.WORMHOLE))
+            )
+        except ConnectionDuplicate:
+            continue
+
+    return universe
+
+
+def measure(universe: Universe, runs: int) -> List[float]:
+    timings = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        ChainMatrix(universe)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def report(name: str, timings: List[float]) -> None:
+    print(
+        f"{name:>14}: median {statistics.median(timings) * 1000:8.3f}ms "
+        f"max {max(timings) * 1000:8.3f}ms "
+        f"({len(timings)} matrices)"
+    )
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    random.seed(1)
+    static.warm()
+
+    systems = random.sample(
+        sorted(Universe.eve().systems, key=lambda s: s.identifier), size
+    )
+
+    report(f"tree {size}", measure(tree(systems), runs))
+    report(f"bushy {size}", measure(bushy(systems), runs))
+
+
+if __name__ == "__main__":
+    main()
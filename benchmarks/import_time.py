@@ -0,0 +1,62 @@
+"""Measure the cold start of `unchaind.command` with all static tables.
+
+Every run happens in a fresh interpreter that imports `unchaind.command`
+and loads every static table with `unchaind.static.warm`, as the daemon
+does. The `text` runs parse the static dumps as `unchaind` did before the
+compiled cache existed, the `cache` runs read the compiled cache from a
+temporary directory that was primed by a first run.
+
+Run with `python benchmarks/import_time.py [runs]`."""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import Dict, List
+
+# Static tables are loaded on first use, load them all like the daemon
+STARTUP = "import unchaind.command, unchaind.static; unchaind.static.warm()"
+
+
+def measure(environment: Dict[str, str], runs: int) -> List[float]:
+    timings = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", STARTUP],
+            env=environment,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def report(name: str, timings: List[float]) -> None:
+    print(
+        f"{name:>6}: min {min(timings) * 1000:8.1f}ms "
+        f"median {statistics.median(timings) * 1000:8.1f}ms "
+        f"({len(timings)} runs)"
+    )
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with tempfile.TemporaryDirectory() as directory:
+        text = dict(os.environ, UNCHAIND_NO_CACHE="1")
+        cache = dict(os.environ, UNCHAIND_CACHE_DIR=directory)
+        cache.pop("UNCHAIND_NO_CACHE", None)
+
+        # Prime the cache
+        measure(cache, 1)
+
+        report("text", measure(text, runs))
+        report("cache", measure(cache, runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Time matching killmails against many kill notifiers.
+
+`match_killmail` compiles the filters of every notifier for each killmail,
+`KillMatcher` compiles them once up front.
+
+Run with `python benchmarks/match.py [notifiers] [attackers]` in a
+development environment."""
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from typing import Any, Dict, List
+
+from unchaind.notifier.kill import KillMatcher, match_killmail
+from unchaind.universe import Universe
+
+
+def notifier(index: int) -> Dict[str, Any]:
+    """A notifier like ours, entities and some location and value."""
+    return {
+        "type": "console",
+        "subscribes_to": "kill",
+        "filter": {
+            "require_all_of": [
+                {"alliance": 99_000_000 + index},
+                {"minimum_value": 10_000_000},
+            ],
+            "require_any_of": [{"location": "chain"}, {"security": "null"}],
+            "exclude_if_any": [{"corporation_loss": 98_000_000 + index}],
+        },
+    }
+
+
+def killmail(attackers: int) -> Dict[str, Any]:
+    def entity() -> Dict[str, int]:
+        return {
+            "alliance_id": random.randrange(99_000_000, 99_000_200),
+            "corporation_id": random.randrange(98_000_000, 98_000_500),
+            "character_id": random.randrange(90_000_000, 95_000_000),
+        }
+
+    return {
+        "killID": 1,
+        "killmail": {
+            "killmail_id": 1,
+            "solar_system_id": random.randrange(30_000_001, 30_005_000),
+            "victim": entity(),
+            "attackers": [entity() for _ in range(attackers)],
+        },
+        "zkb": {"totalValue": random.randrange(1, 1_000_000_000)},
+    }
+
+
+def report(name: str, timings: List[float]) -> None:
+    print(
+        f"{name:>14}: median {statistics.median(timings) * 1e6:10.1f}us "
+        f"max {max(timings) * 1e6:10.1f}us "
+        f"({len(timings)} killmails)"
+    )
+
+
+def main() -> None:
+    notifiers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    attackers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    random.seed(1)
+
+    config = {"notifier": [notifier(n) for n in range(notifiers)]}
+    universe = Universe.from_empty_sync()
+    packages = [killmail(attackers) for _ in range(200)]
+
+    loop = asyncio.get_event_loop()
+
+    timings = []
+
+    for package in packages:
+        start = time.perf_counter()
+        loop.run_until_complete(match_killmail(config, universe, package))
+        timings.append(time.perf_counter() - start)
+
+    report("match_killmail", timings)
+
+    matcher = KillMatcher(config)
+    timings = []
+
+    for package in packages:
+        start = time.perf_counter()
+        matcher.match(package, universe)
+        timings.append(time.perf_counter() - start)
+
+    report("KillMatcher", timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Time routing between random pairs of systems.
+
+Routes go over the EVE stargates merged with a small chain of wormholes
+between random systems, the same pairs are used for every router.
+
+Run with `python benchmarks/path.py [routes]` in a development
+environment."""
+import random
+import statistics
+import sys
+import time
+
+from typing import Callable, List
+
+import unchaind.static as static
+
+from unchaind.exception import ConnectionDuplicate
+from unchaind.path import (
+    path,
+    bidirectional_path,
+    route,
+    alternatives,
+    cached_route,
+    route_cache,
+    costs,
+)
+from unchaind.universe import Universe, Multiverse, Connection, State, System
+
+
+Router = Callable[[System, System, Multiverse], object]
+
+
+def chain(systems: List[System], size: int) -> Universe:
+    """A universe with a few random wormholes."""
+    universe = Universe.from_empty_sync()
+
+    for left, right in zip(
+        random.sample(systems, size), random.sample(systems, size)
+    ):
+        if left == right:
+            continue
+
+        try:
+            universe.connect_sync(
+                Connection(left, right, State(State.WORMHOLE))
+            )
+        except ConnectionDuplicate:
+            continue
+
+    return universe
+
+
+def measure(
+    router: Router, multiverse: Multiverse, pairs: List[List[System]]
+) -> List[float]:
+    timings = []
+
+    for left, right in pairs:
+        start = time.perf_counter()
+        router(left, right, multiverse)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def report(name: str, timings: List[float]) -> None:
+    print(
+        f"{name:>14}: median {statistics.median(timings) * 1000:8.3f}ms "
+        f"max {max(timings) * 1000:8.3f}ms "
+        f"({len(timings)} routes)"
+    )
+
+
+def main() -> None:
+    routes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    random.seed(1)
+    static.warm()
+
+    eve = Universe.eve()
+    systems = sorted(eve.systems, key=lambda s: s.identifier)
+
+    multiverse = Multiverse.from_universes_sync(eve, chain(systems, 20))
+
+    pairs = [random.sample(systems, 2) for _ in range(routes)]
+
+    report("path", measure(path, multiverse, pairs))
+    report("bidirectional", measure(bidirectional_path, multiverse, pairs))
+    report("route", measure(route, multiverse, pairs))
+    report(
+        "route safe",
+        measure(
+            lambda left, right, multiverse: route(
+                left, right, multiverse, costs["safe"]
+            ),
+            multiverse,
+            pairs,
+        ),
+    )
+
+    # Once to fill the cache and once more to hit it
+    measure(cached_route, multiverse, pairs)
+    report("route cached", measure(cached_route, multiverse, pairs))
+
+    cache = route_cache(multiverse)
+    print(f"{'':>14}  {cache.hits} hits {cache.misses} misses")
+
+    # Every search for alternatives is many routes, keep the budget out of
+    # the way and time fewer of them
+    report(
+        "alternatives 5",
+        measure(
+            lambda left, right, multiverse: alternatives(
+                left, right, multiverse, 5, budget=60.0
+            ),
+            multiverse,
+            pairs[: max(1, routes // 10)],
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
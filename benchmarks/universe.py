@@ -0,0 +1,102 @@
+"""Compare the coroutine based and synchronous ways of changing a Universe.
+
+`async` awaits a coroutine for every connection as `Universe.from_eve` and
+`Universe.update_with` used to, `sync` uses the `_sync` methods.
+
+Run with `python benchmarks/universe.py [runs]` in a development
+environment."""
+import asyncio
+import statistics
+import sys
+import time
+
+from typing import Any, Callable, List
+
+import unchaind.static as static
+
+from unchaind.universe import Universe, Connection, Delta, State, System
+
+
+async def from_eve_async() -> Universe:
+    universe = await Universe.from_empty()
+
+    for left, right in static.stargate_graph().edges():
+        state = State()
+        state.stargate = True
+
+        await universe.connect(Connection(System(left), System(right), state))
+
+    return universe
+
+
+async def update_with_async(universe: Universe, other: Universe) -> None:
+    delta = Delta.from_universes(universe, other)
+
+    for connection in delta.connections_add:
+        await universe.connect(connection)
+
+    for connection in delta.connections_del:
+        await universe.disconnect(connection)
+
+
+def halves() -> List[Universe]:
+    """Two universes that each have a different half of New Eden."""
+    eve = Universe.from_eve_sync()
+    universes = [Universe.from_empty_sync(), Universe.from_empty_sync()]
+
+    for index, connection in enumerate(eve.connections.values()):
+        universes[index % 2].connect_sync(connection)
+
+    return universes
+
+
+def measure(
+    function: Callable[..., Any],
+    runs: int,
+    setup: Callable[[], List[Any]] = list,
+) -> List[float]:
+    timings = []
+
+    for _ in range(runs):
+        arguments = setup()
+
+        start = time.perf_counter()
+        function(*arguments)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def report(name: str, timings: List[float]) -> None:
+    print(
+        f"{name:>18}: min {min(timings) * 1000:8.2f}ms "
+        f"median {statistics.median(timings) * 1000:8.2f}ms "
+        f"({len(timings)} runs)"
+    )
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    loop = asyncio.new_event_loop()
+
+    static.warm()
+
+    report(
+        "from_eve async",
+        measure(lambda: loop.run_until_complete(from_eve_async()), runs),
+    )
+    report("from_eve sync", measure(Universe.from_eve_sync, runs))
+
+    def update_async(left: Universe, right: Universe) -> None:
+        loop.run_until_complete(update_with_async(left, right))
+
+    def update_sync(left: Universe, right: Universe) -> None:
+        left.update_with_sync(right)
+
+    report("update_with async", measure(update_async, runs, halves))
+    report("update_with sync", measure(update_sync, runs, halves))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,9 @@ setup(
     tests_require=["pytest", "pytest-cov"],
     entry_points={"console_scripts": ["unchaind=unchaind.command:main"]},
     extras_require={
-        "dev": ["pre-commit", "flake8", "black", "pytest", "pytest-cov", "mypy==0.660"]
+        "dev": ["pre-commit", "flake8", "black", "pytest", "pytest-cov", "mypy==0.660"],
+        "numpy": ["numpy"],
+        "curl": ["pycurl"],
     },
     package_data={"unchaind": ["unchaind/data"]},
     include_package_data=True,
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+from typing import Any, Optional
+
+
+_cache: Optional[tempfile.TemporaryDirectory] = None
+
+
+def pytest_configure(config: Any) -> None:
+    """Keep the compiled static tables of the test run out of the cache
+       directory of whoever runs the tests."""
+    global _cache
+
+    _cache = tempfile.TemporaryDirectory(prefix="unchaind-test-")
+    os.environ["UNCHAIND_CACHE_DIR"] = _cache.name
+
+
+def pytest_unconfigure(config: Any) -> None:
+    if _cache is not None:
+        _cache.cleanup()
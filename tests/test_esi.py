@@ -0,0 +1,225 @@
+import unittest
+import asyncio
+import json
+
+from typing import Dict, Any, List
+
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application, RequestHandler
+
+from unchaind.util import esi as unchaind_esi
+from unchaind.util import kill as unchaind_util_kill
+
+from tests.test_kill import standard_package, empty_universe
+
+loop = asyncio.get_event_loop()
+
+
+class ESIHandler(RequestHandler):
+    """A stand-in for ESI that names everything after its id and counts
+       the requests it gets, answering each after `delay` seconds. Ids from
+       500 to 999 are types, everything else is a character."""
+
+    delay = 0.0
+
+    # How many requests are being answered right now and the most there
+    # were at the same time
+    in_flight = 0
+    most_in_flight = 0
+
+    def initialize(self, seen: List[str], names: List[int]) -> None:
+        self.seen = seen
+        self.names = names
+
+    async def wait(self) -> None:
+        ESIHandler.in_flight += 1
+        ESIHandler.most_in_flight = max(
+            ESIHandler.most_in_flight, ESIHandler.in_flight
+        )
+
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            ESIHandler.in_flight -= 1
+
+    async def get(self, kind: str, identifier: str) -> None:
+        self.seen.append(self.request.path)
+        await self.wait()
+
+        if kind in ("corporations", "alliances"):
+            self.write({"ticker": f"T{identifier}"})
+        else:
+            self.write({"name": f"{kind} {identifier}"})
+
+    async def post(self) -> None:
+        self.seen.append(self.request.path)
+        await self.wait()
+
+        ids = json.loads(self.request.body)
+        self.names.extend(ids)
+
+        if len(ids) > 1000 or 9 in ids:
+            self.set_status(400 if len(ids) > 1000 else 404)
+            self.write({"error": "nope"})
+            return
+
+        self.write(
+            json.dumps(
+                [
+                    {
+                        "id": i,
+                        "name": f"name {i}",
+                        "category": (
+                            "inventory_type"
+                            if 500 <= i < 1000
+                            else "character"
+                        ),
+                    }
+                    for i in ids
+                ]
+            )
+        )
+
+
+def big_package(attackers: int) -> Dict[str, Any]:
+    package = standard_package()
+
+    package["killID"] = 1
+    package["killmail"]["killmail_time"] = "2019-01-01T00:00:00Z"
+    package["killmail"]["victim"]["ship_type_id"] = 587
+    package["killmail"]["attackers"] = [
+        {
+            "alliance_id": 1 + n % 3,
+            "corporation_id": 10 + n % 5,
+            "character_id": 100_000 + n,
+            "ship_type_id": 600 + n % 7,
+            "damage_done": n,
+            "final_blow": n == 0,
+        }
+        for n in range(attackers)
+    ]
+
+    return package
+
+
+class ESITest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.seen: List[str] = []
+        self.names: List[int] = []
+        requests = {"seen": self.seen, "names": self.names}
+
+        sock, port = bind_unused_port()
+        self.server = HTTPServer(
+            Application(
+                [
+                    (r"/universe/names/", ESIHandler, requests),
+                    (
+                        r"/(characters|corporations|alliances|universe/types)"
+                        r"/(\d+)/",
+                        ESIHandler,
+                        requests,
+                    ),
+                ]
+            )
+        )
+        self.server.add_sockets([sock])
+
+        self.original = unchaind_esi._ESI
+        unchaind_esi._ESI = f"http://127.0.0.1:{port}/"
+
+        self.clear()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+        unchaind_esi._ESI = self.original
+        self.clear()
+
+    def clear(self) -> None:
+        for cached in (
+            unchaind_esi.character_details,
+            unchaind_esi.corporation_details,
+            unchaind_esi.alliance_details,
+            unchaind_esi.type_details,
+            unchaind_esi.character_name,
+            unchaind_esi.type_name,
+        ):
+            cached.cache_clear()
+
+    def test_resolve_names_chunks(self) -> None:
+        names = loop.run_until_complete(
+            unchaind_esi.resolve_names(range(100, 2600))
+        )
+
+        self.assertEqual(len(names), 2500)
+        self.assertEqual(names[100], "name 100")
+        self.assertEqual(self.seen, ["/universe/names/"] * 3)
+
+        # Only the ids we don't know yet are asked for
+        names = loop.run_until_complete(
+            unchaind_esi.resolve_names(range(2500, 2700))
+        )
+
+        self.assertEqual(len(names), 200)
+        self.assertEqual(len(self.seen), 4)
+
+    def test_resolve_names_unknown(self) -> None:
+        # ESI refuses the chunk, one by one lookups still work
+        names = loop.run_until_complete(unchaind_esi.resolve_names([9, 10]))
+
+        self.assertEqual(names, {})
+        self.assertEqual(
+            loop.run_until_complete(unchaind_esi.character_name(10)),
+            "characters 10",
+        )
+
+    def test_stats_for_killmail_bulk(self) -> None:
+        package = big_package(300)
+
+        stats = loop.run_until_complete(
+            unchaind_util_kill.stats_for_killmail(package, empty_universe())
+        )
+
+        assert stats is not None
+        self.assertEqual(stats.victim_ship, "name 587")
+        self.assertEqual(stats.final_blow_moniker, "name 100000 [T1]")
+        self.assertIn("43 name 600", stats.attacker_ships_summary)
+        self.assertIn("100 T1", stats.attacker_entities_summary)
+
+        # One request for all names and one for each of the three alliance
+        # tickers, instead of requests per attacker
+        self.assertEqual(self.seen.count("/universe/names/"), 1)
+        self.assertEqual(len(self.seen), 1 + 3)
+
+        # Only the characters we name and the ships were asked for
+        self.assertEqual(
+            set(self.names),
+            {200, 100_000, 100_299, 587} | set(range(600, 607)),
+        )
+
+        loop.run_until_complete(
+            unchaind_util_kill.stats_for_killmail(package, empty_universe())
+        )
+
+        # Everything is cached for the next kill with the same people in it
+        self.assertEqual(len(self.seen), 4)
+
+    def test_stats_for_killmail_concurrent(self) -> None:
+        ESIHandler.delay = 0.1
+        ESIHandler.most_in_flight = 0
+
+        try:
+            stats = loop.run_until_complete(
+                unchaind_util_kill.stats_for_killmail(
+                    big_package(30), empty_universe()
+                )
+            )
+        finally:
+            ESIHandler.delay = 0.0
+
+        self.assertIsNotNone(stats)
+
+        # The names and the three tickers were all looked up at the same
+        # time, not one after the other
+        self.assertEqual(len(self.seen), 1 + 3)
+        self.assertEqual(ESIHandler.most_in_flight, len(self.seen))
@@ -1,10 +1,19 @@
 import unittest
 import asyncio
+import importlib.util
+import json
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple, Optional
+
+from tornado.iostream import IOStream
+
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application, RequestHandler
 
 from unchaind import universe as unchaind_universe
 from unchaind.notifier import kill as unchaind_kill
+from unchaind.util import kill as unchaind_util_kill
 
 loop = asyncio.get_event_loop()
 
@@ -41,6 +50,13 @@ def empty_universe() -> unchaind_universe.Universe:
     return loop.run_until_complete(unchaind_universe.Universe.from_empty())
 
 
+def kill(
+    package: Dict[str, Any],
+    universe: Optional[unchaind_universe.Universe] = None,
+) -> unchaind_kill.Kill:
+    return unchaind_kill.Kill(package, universe or empty_universe())
+
+
 class NotifierKillTest(unittest.TestCase):
     def test__match_alliance_no_matches(self) -> None:
         self.assertEqual(
@@ -396,6 +412,83 @@ class NotifierKillTest(unittest.TestCase):
             True,
         )
 
+    def test__match_within_jumps(self) -> None:
+        chain = empty_universe()
+
+        # Jita is 9 jumps from Amarr
+        jita = unchaind_universe.System(30_000_142)
+        j100820 = unchaind_universe.System(31_002_479)
+
+        chain.connect_sync(
+            unchaind_universe.Connection(
+                jita, j100820, unchaind_universe.State()
+            )
+        )
+
+        for jumps, expected in ((8, False), (9, True)):
+            self.assertEqual(
+                loop.run_until_complete(
+                    unchaind_kill._match_within_jumps(
+                        {"of": "chain", "jumps": jumps},
+                        standard_package(),
+                        chain,
+                    )
+                ),
+                expected,
+            )
+
+        # Connecting the chain to Amarr brings the kill onto the chain
+        chain.connect_sync(
+            unchaind_universe.Connection(
+                j100820,
+                unchaind_universe.System(30_002_187),
+                unchaind_universe.State(),
+            )
+        )
+
+        self.assertEqual(
+            loop.run_until_complete(
+                unchaind_kill._match_within_jumps(
+                    {"of": "chain", "jumps": 0}, standard_package(), chain
+                )
+            ),
+            True,
+        )
+
+        self.assertEqual(
+            loop.run_until_complete(
+                unchaind_kill._match_within_jumps(
+                    {"of": 30_000_142, "jumps": 2}, standard_package(), chain
+                )
+            ),
+            True,
+        )
+
+    def test__match_within_jumps_home(self) -> None:
+        multiverse = unchaind_universe.Multiverse.from_universes_sync(
+            empty_universe()
+        )
+
+        self.assertEqual(
+            loop.run_until_complete(
+                unchaind_kill._match_within_jumps(
+                    {"of": "home", "jumps": 9}, standard_package(), multiverse
+                )
+            ),
+            False,
+        )
+
+        multiverse.home = unchaind_universe.System(30_000_142)
+
+        self.assertEqual(
+            loop.run_until_complete(
+                unchaind_kill._match_within_jumps(
+                    {"of": "home", "jumps": 9}, standard_package(), multiverse
+                )
+            ),
+            True,
+        )
+
     def test__match_security_high(self) -> None:
         self.assertEqual(
             loop.run_until_complete(
@@ -603,3 +696,483 @@ class MatchKillmailTest(unittest.TestCase):
             ),
             [],
         )
+
+    def test__filter_order(self) -> None:
+        filter1 = unchaind_kill.Filter(
+            {
+                "require_all_of": [
+                    {"alliance_kill": 1},
+                    {"minimum_value": 100_000},
+                ],
+                "exclude_if_any": [{"within_jumps": {"jumps": 1}}],
+            }
+        )
+
+        # Cheapest section first, cheapest matcher first within it
+        self.assertEqual(
+            [section for section, _ in filter1.sections],
+            ["require_all_of", "exclude_if_any"],
+        )
+
+        # A kill that is too cheap never gets to the expensive matchers,
+        # which would fail on this package
+        package = standard_package()
+        package["zkb"]["totalValue"] = 1
+        del package["killmail"]["attackers"]
+        del package["killmail"]["solar_system_id"]
+
+        self.assertFalse(filter1(kill(package)))
+
+    def test__filter_sections(self) -> None:
+        for section, matchers, expected in (
+            ("require_all_of", [{"alliance": 1}, {"alliance": 2}], True),
+            ("require_all_of", [{"alliance": 1}, {"alliance": 9}], False),
+            ("require_any_of", [{"alliance": 9}, {"alliance": 2}], True),
+            ("require_any_of", [{"alliance": 9}, {"alliance": 8}], False),
+            ("exclude_if_any", [{"alliance": 9}, {"alliance": 2}], False),
+            ("exclude_if_any", [{"alliance": 9}, {"alliance": 8}], True),
+            ("exclude_if_all", [{"alliance": 1}, {"alliance": 2}], False),
+            ("exclude_if_all", [{"alliance": 1}, {"alliance": 9}], True),
+            ("require_all_of", [], True),
+        ):
+            self.assertEqual(
+                unchaind_kill.Filter({section: matchers})(
+                    kill(standard_package())
+                ),
+                expected,
+            )
+
+    def test__filter_unknown(self) -> None:
+        with self.assertRaises(ValueError):
+            unchaind_kill.Filter({"require_all_of": [{"alliance_kil": 1}]})
+
+    def test__filter_within_jumps_of(self) -> None:
+        for of in ("Jitaa", 1, "30000000"):
+            with self.assertRaises(ValueError):
+                unchaind_kill.Filter(
+                    {
+                        "require_all_of": [
+                            {"within_jumps": {"jumps": 3, "of": of}}
+                        ]
+                    }
+                )
+
+        # Amarr is a few jumps from Jita, by name or by id
+        for of in ("jita", 30_000_142, "30000142"):
+            filter1 = unchaind_kill.Filter(
+                {"require_all_of": [{"within_jumps": {"jumps": 9, "of": of}}]}
+            )
+            self.assertTrue(filter1(kill(standard_package())))
+
+    def test__kill_matcher(self) -> None:
+        config: Dict[str, Any] = {
+            "notifier": [
+                {"subscribes_to": "system"},
+                {
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"alliance_loss": 2}]},
+                },
+                {
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"alliance_loss": 1}]},
+                },
+                {"subscribes_to": "kill"},
+            ]
+        }
+
+        matcher = unchaind_kill.KillMatcher(config)
+
+        self.assertEqual(len(matcher.notifiers), 3)
+        self.assertEqual(
+            matcher.match(standard_package(), empty_universe()),
+            [config["notifier"][1], config["notifier"][3]],
+        )
+
+    def test__entities(self) -> None:
+        entities = unchaind_kill.Entities(standard_package())
+
+        self.assertEqual(entities.kill["alliance_id"], {1, 1111})
+        self.assertEqual(entities.loss["character_id"], {200})
+        self.assertEqual(len(entities), 11)
+
+        self.assertIn(("kill", "corporation_id", 11), entities)
+        self.assertNotIn(("loss", "corporation_id", 11), entities)
+        self.assertEqual(len(set(entities)), 11)
+
+        # Gathered once for every matcher that looks at the same kill
+        kill1 = kill(standard_package())
+        self.assertIs(kill1.entities, kill1.entities)
+
+    def test__kill_matcher_candidates(self) -> None:
+        config: Dict[str, Any] = {
+            "notifier": [
+                {
+                    "subscribes_to": "kill",
+                    "filter": {
+                        "require_all_of": [
+                            {"minimum_value": 1},
+                            {"alliance_kill": 1},
+                        ]
+                    },
+                },
+                {
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"corporation_loss": 10}]},
+                },
+                {
+                    "subscribes_to": "kill",
+                    "filter": {
+                        "require_any_of": [
+                            {"character_kill": 9},
+                            {"character_loss": 200},
+                        ]
+                    },
+                },
+                {
+                    "subscribes_to": "kill",
+                    "filter": {
+                        "require_any_of": [
+                            {"character_kill": 9},
+                            {"security": "high"},
+                        ]
+                    },
+                },
+            ]
+        }
+
+        matcher = unchaind_kill.KillMatcher(config)
+
+        self.assertEqual(
+            [predicate.gate for _, predicate in matcher.notifiers],
+            [
+                {("kill", "alliance_id", 1)},
+                {("loss", "corporation_id", 10)},
+                {("kill", "character_id", 9), ("loss", "character_id", 200)},
+                None,
+            ],
+        )
+
+        # The victim's corporation is 20, not 10
+        self.assertEqual(
+            matcher.candidates(kill(standard_package())), [0, 2, 3]
+        )
+        self.assertEqual(
+            matcher.match(standard_package(), empty_universe()),
+            [
+                config["notifier"][0],
+                config["notifier"][2],
+                config["notifier"][3],
+            ],
+        )
+
+        package = standard_package()
+        package["killmail"]["attackers"] = []
+        package["killmail"]["victim"] = {"corporation_id": 99}
+
+        self.assertEqual(matcher.candidates(kill(package)), [3])
+
+    def test__kill_matcher_systems(self) -> None:
+        config: Dict[str, Any] = {
+            "notifier": [
+                {
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"location": "Jita"}]},
+                },
+                {
+                    "subscribes_to": "kill",
+                    "filter": {
+                        "require_all_of": [{"alliance": 1}],
+                        "require_any_of": [
+                            {"location": "chain"},
+                            {"security": "high"},
+                        ],
+                    },
+                },
+                {
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"location": "wspace"}]},
+                },
+                {
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"security": "nul"}]},
+                },
+            ]
+        }
+
+        matcher = unchaind_kill.KillMatcher(config)
+
+        self.assertEqual(
+            [predicate.system_gate for _, predicate in matcher.notifiers],
+            [
+                {("name", "jita")},
+                {("chain",), ("security", "high")},
+                {("wspace",)},
+                set(),
+            ],
+        )
+
+        # Amarr is in highsec
+        self.assertEqual(matcher.candidates(kill(standard_package())), [1])
+
+        package = standard_package()
+        package["killmail"]["solar_system_id"] = 31_002_479  # J100820
+
+        self.assertEqual(matcher.candidates(kill(package)), [2])
+
+        chain = empty_universe()
+        chain.connect_sync(
+            unchaind_universe.Connection(
+                unchaind_universe.System(31_002_479),
+                unchaind_universe.System(30_000_142),
+                unchaind_universe.State(),
+            )
+        )
+
+        self.assertEqual(matcher.candidates(kill(package, chain)), [1, 2])
+        self.assertEqual(
+            matcher.match(package, chain),
+            [config["notifier"][1], config["notifier"][2]],
+        )
+
+
+class RedisQHandler(RequestHandler):
+    """Answers polls with the queued up responses of the test."""
+
+    def initialize(
+        self,
+        responses: List[Tuple[int, Dict[str, Any]]],
+        seen: List[Dict[str, str]],
+    ) -> None:
+        self.responses = responses
+        self.seen = seen
+
+    def get(self) -> None:
+        self.seen.append(
+            {k: self.get_argument(k) for k in self.request.arguments}
+        )
+
+        code, body = self.responses.pop(0)
+
+        self.set_status(code)
+        self.write(json.dumps(body))
+
+
+class CountingHTTPServer(HTTPServer):
+    """Counts the connections it accepts."""
+
+    connections = 0
+
+    def handle_stream(self, stream: IOStream, address: Tuple) -> None:
+        self.connections += 1
+        super().handle_stream(stream, address)
+
+
+class RedisQTest(unittest.TestCase):
+    def test_redisq_poll(self) -> None:
+        responses = [
+            (429, {}),
+            (503, {}),
+            (404, {}),
+            (200, {"package": None}),
+            (200, {"package": standard_package()}),
+        ]
+        seen: List[Dict[str, str]] = []
+
+        sock, port = bind_unused_port()
+        server = HTTPServer(
+            Application(
+                [
+                    (
+                        "/listen.php",
+                        RedisQHandler,
+                        {"responses": responses, "seen": seen},
+                    )
+                ]
+            )
+        )
+        server.add_sockets([sock])
+
+        redisq = unchaind_kill.RedisQ.from_config(
+            {
+                "redisq": {
+                    "queue_id": "unchaind-test",
+                    "ttw": 1,
+                    "url": f"http://127.0.0.1:{port}/listen.php",
+                }
+            }
+        )
+        redisq.backoff = 0.01
+
+        try:
+            # Rate limited and then a server error, we back off further
+            self.assertIsNone(loop.run_until_complete(redisq.poll()))
+            self.assertEqual(redisq.delay, 0.01)
+
+            self.assertIsNone(loop.run_until_complete(redisq.poll()))
+            self.assertEqual(redisq.delay, 0.02)
+
+            # Any other answer we can't use backs off as well
+            self.assertIsNone(loop.run_until_complete(redisq.poll()))
+            self.assertEqual(redisq.delay, 0.04)
+
+            # An empty poll is a fine response and so is a kill
+            self.assertEqual(
+                json.loads(loop.run_until_complete(redisq.poll()) or ""),
+                {"package": None},
+            )
+            self.assertEqual(redisq.delay, 0.0)
+
+            self.assertEqual(
+                json.loads(loop.run_until_complete(redisq.poll()) or ""),
+                {"package": standard_package()},
+            )
+        finally:
+            server.stop()
+            redisq.close()
+
+        self.assertEqual(len(seen), 5)
+
+        for params in seen:
+            self.assertEqual(params, {"queueID": "unchaind-test", "ttw": "1"})
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("pycurl"), "needs pycurl to keep alive"
+    )
+    def test_redisq_keep_alive(self) -> None:
+        responses = [(200, {"package": None}) for _ in range(4)]
+        seen: List[Dict[str, str]] = []
+
+        sock, port = bind_unused_port()
+        server = CountingHTTPServer(
+            Application(
+                [
+                    (
+                        "/listen.php",
+                        RedisQHandler,
+                        {"responses": responses, "seen": seen},
+                    )
+                ]
+            )
+        )
+        server.add_sockets([sock])
+
+        redisq = unchaind_kill.RedisQ(
+            ttw=1, url=f"http://127.0.0.1:{port}/listen.php"
+        )
+
+        try:
+            for _ in range(4):
+                self.assertIsNotNone(loop.run_until_complete(redisq.poll()))
+        finally:
+            server.stop()
+            redisq.close()
+
+        # Every poll went over the same connection
+        self.assertEqual(len(seen), 4)
+        self.assertEqual(server.connections, 1)
+
+
+def standard_stats() -> unchaind_util_kill.KillmailStats:
+    return unchaind_util_kill.KillmailStats(
+        kill_id=1,
+        timestamp=0,
+        victim_moniker="Victim [VIC]",
+        victim_ship="Rifter",
+        victim_ship_typeid=2,
+        final_blow_moniker="Attacker [ATT]",
+        top_damage_moniker="Attacker [ATT]",
+        attacker_entities_summary="1 [ATT]",
+        attacker_ships_summary="1 Rifter",
+        isk_value=1000,
+        solar_system_id=30000142,
+        solar_system_name="Jita",
+    )
+
+
+class EnrichmentTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.calls = 0
+        self.original = unchaind_util_kill.stats_for_killmail
+
+        async def stats_for_killmail(
+            package: Dict[str, Any], universe: unchaind_universe.Universe
+        ) -> unchaind_util_kill.KillmailStats:
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return standard_stats()
+
+        setattr(unchaind_util_kill, "stats_for_killmail", stats_for_killmail)
+
+    def tearDown(self) -> None:
+        setattr(unchaind_util_kill, "stats_for_killmail", self.original)
+
+    def test_enrichment_shares_stats(self) -> None:
+        enrichment = unchaind_util_kill.Enrichment(
+            standard_package(), empty_universe()
+        )
+
+        notifiers = [{"type": "slack"} for _ in range(5)]
+        notifiers += [
+            {"type": "slack", "output": {"include_vanity_stats": True}}
+            for _ in range(5)
+        ]
+        notifiers += [{"type": "discord"}, {"type": "console"}]
+
+        payloads = loop.run_until_complete(
+            asyncio.gather(*[enrichment.payload(n) for n in notifiers])
+        )
+
+        # Ten matched channels, a single enrichment
+        self.assertEqual(self.calls, 1)
+
+        # Rendered once per sink type and output options
+        self.assertTrue(all(p is payloads[0] for p in payloads[1:5]))
+        self.assertTrue(all(p is payloads[5] for p in payloads[6:10]))
+        self.assertIsNot(payloads[0], payloads[5])
+        self.assertEqual(
+            len(payloads[5]["attachments"][0]["fields"]),  # type: ignore
+            len(payloads[0]["attachments"][0]["fields"]) + 2,  # type: ignore
+        )
+        self.assertIn("embeds", payloads[10])  # type: ignore
+        self.assertIsNone(payloads[11])
+
+    def test_enrichment_is_lazy(self) -> None:
+        enrichment = unchaind_util_kill.Enrichment(
+            standard_package(), empty_universe()
+        )
+
+        self.assertIsNone(
+            loop.run_until_complete(enrichment.payload({"type": "console"}))
+        )
+        self.assertEqual(self.calls, 0)
+
+    def test_process_one_killmail_enriches_once(self) -> None:
+        delivered: List[Any] = []
+
+        async def record(
+            notifier: Dict[str, Any], message: str, *, payload: Any = None
+        ) -> None:
+            delivered.append(payload)
+
+        original = dict(unchaind_kill.sinks)
+        unchaind_kill.sinks["slack"] = record
+
+        try:
+            loop.run_until_complete(
+                unchaind_kill.process_one_killmail(
+                    json.dumps({"package": standard_package()}),
+                    {
+                        "notifier": [
+                            {"type": "slack", "subscribes_to": "kill"}
+                            for _ in range(10)
+                        ]
+                    },
+                    unchaind_universe.Multiverse(),
+                )
+            )
+        finally:
+            unchaind_kill.sinks.update(original)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(delivered), 10)
+        self.assertTrue(all(p is delivered[0] for p in delivered))
@@ -1,6 +1,9 @@
+import random
 import unittest
 import asyncio
 
+from typing import Iterator, List
+
 from unchaind import universe as unchaind_universe
 from unchaind import path as unchaind_path
 
@@ -62,3 +65,564 @@ class UniverseTest(unittest.TestCase):
             raise AssertionError
 
         self.assertEqual(len(path1.path), 2)
+
+    def test_path__path__no_path(self) -> None:
+        multiverse1 = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(
+                unchaind_universe.Universe.eve()
+            )
+        )
+
+        # Wormhole space isn't connected to anything by stargates
+        path1 = unchaind_path.path(
+            unchaind_universe.System(30_002_187),
+            unchaind_universe.System(31_002_479),
+            multiverse1,
+        )
+
+        self.assertIsNone(path1)
+
+    def test_path__path__same_system(self) -> None:
+        multiverse1 = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(
+                unchaind_universe.Universe.eve()
+            )
+        )
+
+        path1 = unchaind_path.path(
+            unchaind_universe.System(30_002_187),
+            unchaind_universe.System(30_002_187),
+            multiverse1,
+        )
+
+        if path1 is None:
+            raise AssertionError
+
+        self.assertEqual(path1.path, [unchaind_universe.System(30_002_187)])
+
+    def test_path__path__connected(self) -> None:
+        multiverse1 = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(
+                unchaind_universe.Universe.eve()
+            )
+        )
+
+        path1 = unchaind_path.path(
+            unchaind_universe.System(30_002_187),
+            unchaind_universe.System(30_000_142),
+            multiverse1,
+        )
+
+        if path1 is None:
+            raise AssertionError
+
+        self.assertEqual(path1.path[0], unchaind_universe.System(30_002_187))
+        self.assertEqual(path1.path[-1], unchaind_universe.System(30_000_142))
+
+        for prev, goto in zip(path1.path, path1.path[1:]):
+            self.assertIn(goto, multiverse1.graph[prev])
+
+    def test_path__bidirectional_path(self) -> None:
+        chain = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        loop.run_until_complete(
+            chain.connect(
+                unchaind_universe.Connection(
+                    unchaind_universe.System(30_002_187),
+                    unchaind_universe.System(31_002_479),
+                    unchaind_universe.State(),
+                )
+            )
+        )
+
+        multiverse1 = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(
+                unchaind_universe.Universe.eve(), chain
+            )
+        )
+
+        systems = sorted(multiverse1.systems, key=lambda s: s.identifier)
+        generator = random.Random(1)
+
+        pairs = [generator.sample(systems, 2) for _ in range(25)]
+        pairs.append(
+            [
+                unchaind_universe.System(31_002_479),
+                unchaind_universe.System(30_000_142),
+            ]
+        )
+
+        for left, right in pairs:
+            path1 = unchaind_path.path(left, right, multiverse1)
+            path2 = unchaind_path.bidirectional_path(left, right, multiverse1)
+
+            if path1 is None or path2 is None:
+                self.assertIs(path1, path2)
+                continue
+
+            self.assertEqual(len(path1.path), len(path2.path))
+            self.assertEqual(path2.path[0], left)
+            self.assertEqual(path2.path[-1], right)
+
+            for prev, goto in zip(path2.path, path2.path[1:]):
+                self.assertIn(goto, multiverse1.graph[prev])
+
+    def test_path__route__jumps(self) -> None:
+        multiverse1 = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(
+                unchaind_universe.Universe.eve()
+            )
+        )
+
+        path1 = unchaind_path.route(
+            unchaind_universe.System(30_002_187),
+            unchaind_universe.System(30_002_718),
+            multiverse1,
+        )
+        path2 = unchaind_path.path(
+            unchaind_universe.System(30_002_187),
+            unchaind_universe.System(30_002_718),
+            multiverse1,
+        )
+
+        if path1 is None or path2 is None:
+            raise AssertionError
+
+        self.assertEqual(len(path1.path), len(path2.path))
+        self.assertEqual(path1.cost, len(path1.path) - 1)
+
+        # Rancer is lowsec and so is the system before it
+        path3 = unchaind_path.route(
+            unchaind_universe.System(30_002_187),
+            unchaind_universe.System(30_002_718),
+            multiverse1,
+            unchaind_path.costs["prefer_highsec"],
+        )
+
+        if path3 is None:
+            raise AssertionError
+
+        self.assertEqual(path3.cost, path1.cost + 2 * 9)
+
+    def test_path__route__states(self) -> None:
+        chain = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        amarr = unchaind_universe.System(30_002_187)
+        jita = unchaind_universe.System(30_000_142)
+        j100820 = unchaind_universe.System(31_002_479)
+
+        eol = unchaind_universe.State(
+            unchaind_universe.State.WORMHOLE
+            | unchaind_universe.State.END_OF_LIFE
+        )
+        frigate = unchaind_universe.State(
+            unchaind_universe.State.WORMHOLE
+            | unchaind_universe.State.FRIGATE_SIZED
+        )
+
+        loop.run_until_complete(
+            chain.connect(unchaind_universe.Connection(amarr, j100820, eol))
+        )
+        loop.run_until_complete(
+            chain.connect(unchaind_universe.Connection(j100820, jita, frigate))
+        )
+
+        multiverse1 = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(
+                unchaind_universe.Universe.eve(), chain
+            )
+        )
+
+        path1 = unchaind_path.route(amarr, jita, multiverse1)
+
+        if path1 is None:
+            raise AssertionError
+
+        self.assertEqual(path1.path, [amarr, j100820, jita])
+
+        # The end of life connection costs 5, still cheaper than 9 jumps
+        path2 = unchaind_path.route(
+            amarr, jita, multiverse1, unchaind_path.costs["avoid_end_of_life"]
+        )
+
+        if path2 is None:
+            raise AssertionError
+
+        self.assertEqual(path2.path, [amarr, j100820, jita])
+        self.assertEqual(path2.cost, 6.0)
+
+        # A capital can't take the frigate hole
+        path3 = unchaind_path.route(
+            amarr, jita, multiverse1, unchaind_path.costs["capital"]
+        )
+
+        if path3 is None:
+            raise AssertionError
+
+        self.assertEqual(len(path3.path), 10)
+        self.assertNotIn(j100820, path3.path)
+
+        path4 = unchaind_path.route(
+            jita, j100820, multiverse1, unchaind_path.cost_no_frigate
+        )
+
+        if path4 is None:
+            raise AssertionError
+
+        self.assertEqual(path4.path[-2:], [amarr, j100820])
+
+    def test_path__distances(self) -> None:
+        chain = unchaind_universe.Universe.from_empty_sync()
+
+        multiverse1 = unchaind_universe.Multiverse.from_universes_sync(chain)
+        multiverse1.home = unchaind_universe.System(31_002_479)
+
+        jita = unchaind_universe.System(30_000_142)
+
+        # Home is in wormhole space and not connected to anything yet
+        self.assertIsNone(unchaind_path.jumps_from_home(multiverse1, jita))
+
+        generator = random.Random(1)
+        systems = sorted(
+            unchaind_universe.Universe.eve().systems,
+            key=lambda s: s.identifier,
+        )
+
+        connections = [
+            unchaind_universe.Connection(
+                multiverse1.home,
+                unchaind_universe.System(30_002_187),
+                unchaind_universe.State(),
+            )
+        ] + [
+            unchaind_universe.Connection(
+                *generator.sample(systems, 2), unchaind_universe.State()
+            )
+            for _ in range(10)
+        ]
+
+        routes = multiverse1.with_eve()
+
+        for connection in connections:
+            chain.connect_sync(connection)
+
+            # The table is patched, not rebuilt, and is the same as a fresh
+            # search
+            self.assertIs(multiverse1.with_eve(), routes)
+
+            table = unchaind_path.distances(routes, [multiverse1.home])
+            self.assertEqual(
+                table.distance,
+                unchaind_path.Distances(routes, [multiverse1.home]).distance,
+            )
+
+        for connection in connections[::-1]:
+            chain.disconnect_sync(connection)
+            multiverse1.with_eve()
+
+            table = unchaind_path.distances(routes, [multiverse1.home])
+
+            self.assertEqual(
+                table.distance,
+                unchaind_path.Distances(routes, [multiverse1.home]).distance,
+            )
+
+        self.assertNotIn(jita, table)
+
+        chain.connect_sync(connections[0])
+
+        self.assertEqual(unchaind_path.jumps_from_home(multiverse1, jita), 10)
+
+        path1 = unchaind_path.distances(
+            multiverse1.with_eve(), [multiverse1.home]
+        ).path_to(jita)
+
+        if path1 is None:
+            raise AssertionError
+
+        self.assertEqual(path1.path[0], multiverse1.home)
+        self.assertEqual(path1.path[-1], jita)
+
+    def test_path__chain_distances(self) -> None:
+        chain = unchaind_universe.Universe.from_empty_sync()
+
+        generator = random.Random(2)
+        systems = sorted(
+            unchaind_universe.Universe.eve().systems,
+            key=lambda s: s.identifier,
+        )
+
+        connections = [
+            unchaind_universe.Connection(
+                *generator.sample(systems, 2), unchaind_universe.State()
+            )
+            for _ in range(6)
+        ]
+
+        # Systems join and leave the chain, the table follows them
+        for connection in connections + connections[::2]:
+            if frozenset([connection.left, connection.right]) in (
+                chain.connections
+            ):
+                chain.disconnect_sync(connection)
+            else:
+                chain.connect_sync(connection)
+
+            table = unchaind_path.chain_distances(chain)
+
+            # Without changes it is a lookup, the sources aren't compared
+            sources = table.sources
+            table.sources = frozenset()
+
+            self.assertIs(unchaind_path.chain_distances(chain), table)
+            self.assertEqual(table.sources, frozenset())
+
+            table.sources = sources
+            self.assertEqual(table.sources, frozenset(chain.systems))
+            self.assertEqual(
+                table.distance,
+                unchaind_path.Distances(
+                    chain.with_eve(), chain.systems
+                ).distance,
+            )
+
+    def test_path__alternatives(self) -> None:
+        universe1 = unchaind_universe.Universe.from_empty_sync()
+
+        # A 4 by 4 grid of wormhole systems with some end of life holes
+        grid = [
+            [unchaind_universe.System(31_000_001 + x * 4 + y) for y in range(4)]
+            for x in range(4)
+        ]
+
+        for x in range(4):
+            for y in range(4):
+                for dx, dy in ((1, 0), (0, 1)):
+                    if x + dx < 4 and y + dy < 4:
+                        state = unchaind_universe.State()
+                        state.end_of_life = (x + y) % 3 == 0
+
+                        universe1.connect_sync(
+                            unchaind_universe.Connection(
+                                grid[x][y], grid[x + dx][y + dy], state
+                            )
+                        )
+
+        multiverse1 = unchaind_universe.Multiverse.from_universes_sync(
+            universe1
+        )
+
+        left, right = grid[0][0], grid[3][3]
+
+        def simple_paths(
+            systems: List[unchaind_universe.System]
+        ) -> Iterator[List[unchaind_universe.System]]:
+            if systems[-1] == right:
+                yield systems
+                return
+
+            for goto in multiverse1.graph[systems[-1]]:
+                if goto not in systems:
+                    yield from simple_paths(systems + [goto])
+
+        for name in ("jumps", "avoid_end_of_life"):
+            cost = unchaind_path.costs[name]
+
+            expected = sorted(
+                unchaind_path._cost_of(p, multiverse1, cost) or 0.0
+                for p in simple_paths([left])
+            )
+
+            paths = unchaind_path.alternatives(
+                left, right, multiverse1, 8, cost
+            )
+
+            self.assertEqual([p.cost for p in paths], expected[:8])
+            self.assertEqual(len({tuple(p.path) for p in paths}), 8)
+
+            for path1 in paths:
+                self.assertEqual(path1.path[0], left)
+                self.assertEqual(path1.path[-1], right)
+                self.assertEqual(len(set(path1.path)), len(path1.path))
+
+            # Kept until the multiverse changes
+            self.assertEqual(
+                [
+                    p.path
+                    for p in unchaind_path.alternatives(
+                        left, right, multiverse1, 8, cost
+                    )
+                ],
+                [p.path for p in paths],
+            )
+
+        universe1.disconnect_sync(
+            multiverse1.connections[frozenset([grid[0][0], grid[0][1]])]
+        )
+        multiverse1.refresh_sync()
+
+        for path1 in unchaind_path.alternatives(left, right, multiverse1, 8):
+            self.assertNotEqual(path1.path[1], grid[0][1])
+
+        # Without any time only the cheapest Path is found
+        self.assertEqual(
+            len(
+                unchaind_path.alternatives(
+                    left, right, multiverse1, 7, budget=0.0
+                )
+            ),
+            1,
+        )
+
+        # What was cut short isn't kept for when there is time
+        self.assertEqual(
+            len(unchaind_path.alternatives(left, right, multiverse1, 7)), 7
+        )
+
+        self.assertEqual(
+            unchaind_path.alternatives(
+                left,
+                unchaind_universe.System(30_000_142),
+                multiverse1,
+                8,
+            ),
+            [],
+        )
+
+    def test_path__route_cache(self) -> None:
+        chain = unchaind_universe.Universe.from_empty_sync()
+        multiverse1 = chain.with_eve()
+
+        amarr = unchaind_universe.System(30_002_187)
+        jita = unchaind_universe.System(30_000_142)
+        j100820 = unchaind_universe.System(31_002_479)
+
+        cache = unchaind_path.RouteCache(multiverse1, size=2)
+
+        path1 = cache.route(amarr, jita)
+        self.assertIs(cache.route(amarr, jita), path1)
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        if path1 is None:
+            raise AssertionError
+
+        self.assertEqual(path1.version, multiverse1.version)
+
+        # A route that doesn't exist yet is searched again once connections
+        # appear, found routes are kept
+        self.assertIsNone(cache.route(amarr, j100820))
+
+        chain.connect_sync(
+            unchaind_universe.Connection(
+                amarr, j100820, unchaind_universe.State()
+            )
+        )
+        chain.with_eve()
+
+        self.assertIs(cache.route(amarr, jita), path1)
+        self.assertIsNotNone(cache.route(amarr, j100820))
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+        # The least recently used route makes way
+        cache.route(jita, amarr)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 2)
+
+        cache.route(amarr, j100820)
+        self.assertEqual((cache.hits, cache.misses), (3, 4))
+
+        # Losing a connection on a route drops it
+        chain.disconnect_sync(
+            chain.connections[frozenset([amarr, j100820])]
+        )
+        chain.with_eve()
+
+        self.assertIsNone(cache.route(amarr, j100820))
+        self.assertEqual((cache.hits, cache.misses), (3, 5))
+
+        self.assertIs(
+            unchaind_path.route_cache(multiverse1),
+            unchaind_path.route_cache(multiverse1),
+        )
+        self.assertEqual(
+            unchaind_path.cached_route(amarr, jita, multiverse1),
+            unchaind_path.route_cache(multiverse1).route(amarr, jita),
+        )
+        self.assertEqual(unchaind_path.route_cache(multiverse1).hits, 1)
+
+
+@unittest.skipUnless(unchaind_path.have_numpy(), "needs numpy")
+class ChainMatrixTest(unittest.TestCase):
+    def test_path__chain_matrix(self) -> None:
+        chain = unchaind_universe.Universe.from_empty_sync()
+
+        generator = random.Random(3)
+        systems = [
+            unchaind_universe.System(31_000_001 + n) for n in range(40)
+        ]
+
+        # Two separate chains
+        for group in (systems[:30], systems[30:]):
+            for left, right in zip(group, group[1:]):
+                chain.connect_sync(
+                    unchaind_universe.Connection(
+                        left, right, unchaind_universe.State()
+                    )
+                )
+
+        for _ in range(10):
+            left, right = generator.sample(systems[:30], 2)
+
+            if frozenset([left, right]) not in chain.connections:
+                chain.connect_sync(
+                    unchaind_universe.Connection(
+                        left, right, unchaind_universe.State()
+                    )
+                )
+
+        matrix = unchaind_path.chain_matrix(chain)
+
+        self.assertIs(unchaind_path.chain_matrix(chain), matrix)
+        self.assertEqual(set(matrix.systems), set(systems))
+
+        for left in systems:
+            table = unchaind_path.Distances(
+                unchaind_universe.Multiverse.from_universes_sync(chain), [left]
+            )
+
+            for right in systems:
+                self.assertEqual(
+                    matrix.distance(left, right), table.get(right)
+                )
+
+        closest = matrix.closest(systems[0])
+
+        if closest is None:
+            raise AssertionError
+
+        self.assertIn(systems[0], chain.graph[closest[0]])
+        self.assertEqual(closest[1], 1)
+
+        self.assertEqual(
+            matrix.closest(systems[0], [systems[35], systems[5]]),
+            (systems[5], matrix.distance(systems[0], systems[5])),
+        )
+        self.assertIsNone(matrix.closest(systems[0], [systems[35]]))
+        self.assertIsNone(
+            matrix.closest(unchaind_universe.System(30_000_142))
+        )
+
+        chain.disconnect_sync(
+            chain.connections[frozenset([systems[30], systems[31]])]
+        )
+
+        matrix = unchaind_path.chain_matrix(chain)
+
+        self.assertIsNone(matrix.distance(systems[30], systems[31]))
+        self.assertNotIn(systems[30], matrix)
@@ -0,0 +1,156 @@
+import unittest
+import asyncio
+import json
+import time
+
+from typing import Dict, Any, List, Optional, Union
+
+from unchaind import universe as unchaind_universe
+from unchaind.notifier import kill as unchaind_kill
+from unchaind.notifier import pipeline as unchaind_pipeline
+from unchaind.sink import sinks
+
+from tests.test_kill import standard_package
+
+loop = asyncio.get_event_loop()
+
+
+class ListRedisQ(unchaind_kill.RedisQ):
+    """Hands out the given kills and then waits forever, exceptions among
+       them are raised instead."""
+
+    def __init__(self, kills: List[Union[str, Exception]]) -> None:
+        super().__init__()
+        self.kills = kills
+
+    async def poll(self) -> Optional[str]:
+        if not self.kills:
+            await asyncio.sleep(3600)
+
+        item = self.kills.pop(0)
+
+        if isinstance(item, Exception):
+            raise item
+
+        return item
+
+
+def kill(kill_id: int) -> str:
+    package = standard_package()
+    package["killmail"]["killmail_id"] = kill_id
+
+    return json.dumps({"package": package})
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.delivered: List[str] = []
+
+        async def slow(
+            notifier: Dict[str, Any],
+            message: str,
+            *,
+            payload: Optional[Dict[str, Any]] = None,
+        ) -> None:
+            await asyncio.sleep(0.2)
+
+            if "fail" in notifier:
+                raise ValueError(message)
+
+            self.delivered.append(message)
+
+        sinks["slow"] = slow
+
+    def tearDown(self) -> None:
+        del sinks["slow"]
+
+    def run_pipeline(
+        self, config: Dict[str, Any], kills: List[Union[str, Exception]]
+    ) -> float:
+        multiverse = unchaind_universe.Multiverse.from_universes_sync()
+        redisq = ListRedisQ(kills)
+
+        pipeline = unchaind_pipeline.Pipeline(
+            config, multiverse, redisq, workers={"deliver": 8}
+        )
+
+        async def run() -> float:
+            start = time.monotonic()
+            pipeline.start()
+
+            # Let the fetcher get everything into the queues first
+            while redisq.kills:
+                await asyncio.sleep(0.01)
+
+            await pipeline.join()
+            await pipeline.stop()
+
+            return time.monotonic() - start
+
+        return loop.run_until_complete(run())
+
+    def test_pipeline_delivers_concurrently(self) -> None:
+        config = {
+            "notifier": [
+                {
+                    "type": "slow",
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"alliance": 1}]},
+                },
+                {
+                    "type": "slow",
+                    "subscribes_to": "kill",
+                    "filter": {"require_all_of": [{"alliance": 9}]},
+                },
+            ]
+        }
+
+        elapsed = self.run_pipeline(
+            config, [kill(n) for n in range(8)] + ["not json"]
+        )
+
+        # Eight slow deliveries at once instead of one after the other
+        self.assertLess(elapsed, 8 * 0.2)
+        self.assertEqual(
+            sorted(self.delivered),
+            sorted(f"https://zkillboard.com/kill/{n}/" for n in range(8)),
+        )
+
+    def test_pipeline_survives_failures(self) -> None:
+        config = {
+            "notifier": [
+                {"type": "slow", "subscribes_to": "kill", "fail": True},
+                {"type": "slow", "subscribes_to": "kill"},
+            ]
+        }
+
+        self.run_pipeline(config, [kill(1), kill(2)])
+
+        self.assertEqual(
+            sorted(self.delivered),
+            [
+                "https://zkillboard.com/kill/1/",
+                "https://zkillboard.com/kill/2/",
+            ],
+        )
+
+    def test_pipeline_survives_failed_poll(self) -> None:
+        config = {"notifier": [{"type": "slow", "subscribes_to": "kill"}]}
+
+        self.run_pipeline(config, [ValueError("poll"), kill(1)])
+
+        self.assertEqual(self.delivered, ["https://zkillboard.com/kill/1/"])
+
+    def test_pipeline_from_config(self) -> None:
+        pipeline = unchaind_pipeline.Pipeline.from_config(
+            {
+                "pipeline": {"workers": {"deliver": 2}, "queue_size": 3},
+                "redisq": {"queue_id": "unchaind-test"},
+            },
+            unchaind_universe.Multiverse.from_universes_sync(),
+        )
+
+        self.assertEqual(pipeline.workers["deliver"], 2)
+        self.assertEqual(pipeline.workers["enrich"], 4)
+        self.assertEqual(pipeline.queues["deliver"].maxsize, 3)
+        self.assertEqual(pipeline.redisq.queue_id, "unchaind-test")
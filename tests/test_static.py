@@ -1,4 +1,8 @@
+import os
 import unittest
+import tempfile
+
+from typing import Dict
 
 from unchaind import static as unchaind_static
 
@@ -15,3 +19,109 @@ class StaticTest(unittest.TestCase):
 
     def test__static_truesec__value(self) -> None:
         self.assertAlmostEqual(unchaind_static.truesec[30_002_187], 1.0)
+
+    def test__static_stargates__edges(self) -> None:
+        stargates = unchaind_static.stargate_graph()
+        edges = set(stargates.edges())
+
+        self.assertEqual(
+            len(edges),
+            sum(len(v) for v in unchaind_static.connections.values()),
+        )
+
+        for a, rights in unchaind_static.connections.items():
+            for b in rights:
+                self.assertIn((min(a, b), max(a, b)), edges)
+
+    def test__static_stargates__neighbors(self) -> None:
+        stargates = unchaind_static.stargate_graph()
+
+        self.assertEqual(
+            sorted(stargates.neighbors_of(30_000_001)),
+            [30_000_003, 30_000_005, 30_000_007],
+        )
+        self.assertIn(30_000_001, stargates.neighbors_of(30_000_003))
+
+        self.assertNotIn(31_002_479, stargates)
+        self.assertEqual(len(stargates.neighbors_of(31_002_479)), 0)
+
+
+class StaticLazyTest(unittest.TestCase):
+    def test__lazy_table__load_once(self) -> None:
+        calls = []
+
+        def load() -> Dict[int, str]:
+            calls.append(None)
+            return {1: "one"}
+
+        table = unchaind_static.LazyTable(load)
+
+        self.assertFalse(table.loaded)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(table[1], "one")
+        self.assertIn(1, table)
+        self.assertEqual(len(table), 1)
+        self.assertEqual(dict(table), {1: "one"})
+
+        self.assertTrue(table.loaded)
+        self.assertEqual(len(calls), 1)
+
+    def test__warm(self) -> None:
+        unchaind_static.warm()
+
+        self.assertTrue(unchaind_static.systems.loaded)
+        self.assertTrue(unchaind_static.truesec.loaded)
+
+
+class StaticCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.environ = dict(os.environ)
+
+        os.environ.pop("UNCHAIND_NO_CACHE", None)
+        os.environ["UNCHAIND_CACHE_DIR"] = self.directory.name
+
+    def tearDown(self) -> None:
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+        self.directory.cleanup()
+
+    def test__cache__roundtrip(self) -> None:
+        compiled = unchaind_static.load_system_table()
+
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.directory.name, "system.bin"))
+        )
+
+        self.assertEqual(unchaind_static.load_system_table(), compiled)
+        self.assertEqual(
+            unchaind_static.load_systems(), unchaind_static.systems
+        )
+        # Once to compile, once from the cache
+        for _ in range(2):
+            self.assertEqual(
+                unchaind_static.load_connections(),
+                unchaind_static.connections,
+            )
+
+    def test__cache__stale(self) -> None:
+        unchaind_static.load_system_table()
+
+        path = os.path.join(self.directory.name, "system.bin")
+
+        with open(path, "r+b") as f:
+            f.seek(6)
+            f.write(b"\x00" * 32)
+
+        self.assertEqual(
+            unchaind_static.load_systems(), unchaind_static.systems
+        )
+
+        with open(path, "wb") as f:
+            f.write(b"garbage")
+
+        self.assertEqual(
+            unchaind_static.load_truesec(), unchaind_static.truesec
+        )
@@ -0,0 +1,64 @@
+import unittest
+import asyncio
+
+from typing import Any
+
+from unchaind import universe as unchaind_universe
+from unchaind.notifier import system as unchaind_system
+
+loop = asyncio.get_event_loop()
+
+
+class NotifierSystemTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.universe = unchaind_system._universe
+        self.version = unchaind_system._version
+
+        unchaind_system._universe = unchaind_universe.Universe.from_empty_sync()
+        unchaind_system._version = None
+
+    def tearDown(self) -> None:
+        unchaind_system._universe = self.universe
+        unchaind_system._version = self.version
+
+    def test_periodic_applies_changes(self) -> None:
+        chain = unchaind_universe.Universe.from_empty_sync()
+        multiverse = unchaind_universe.Multiverse.from_universes_sync(chain)
+
+        state = unchaind_universe.State(unchaind_universe.State.WORMHOLE)
+        conn1 = unchaind_universe.Connection(
+            unchaind_universe.System(30_000_492),
+            unchaind_universe.System(30_000_493),
+            state,
+        )
+        conn2 = unchaind_universe.Connection(
+            unchaind_universe.System(30_000_493),
+            unchaind_universe.System(30_000_494),
+            state,
+        )
+
+        config = {"notifier": []}
+
+        chain.connect_sync(conn1)
+        loop.run_until_complete(unchaind_system.periodic(config, multiverse))
+
+        # From here on only what changed is applied, nothing is diffed
+        def from_universes(*args: Any) -> None:
+            raise AssertionError("diffed the whole universe")
+
+        original = unchaind_universe.Delta.from_universes
+        setattr(unchaind_universe.Delta, "from_universes", from_universes)
+
+        try:
+            chain.connect_sync(conn2)
+            chain.disconnect_sync(conn1)
+            loop.run_until_complete(
+                unchaind_system.periodic(config, multiverse)
+            )
+        finally:
+            setattr(unchaind_universe.Delta, "from_universes", original)
+
+        self.assertEqual(
+            unchaind_system._universe.connections, multiverse.connections
+        )
+        self.assertEqual(unchaind_system._version, multiverse.version)
@@ -1,12 +1,40 @@
 import unittest
 import asyncio
+import copy
+import pickle
+
+from typing import Dict, Set
 
 from unchaind import universe as unchaind_universe
 from unchaind import exception as unchaind_exception
+from unchaind import static as unchaind_static
 
 loop = asyncio.get_event_loop()
 
 
+def naive_graph(
+    universe: unchaind_universe.Universe
+) -> Dict[unchaind_universe.System, Set[unchaind_universe.System]]:
+    """Flatten the connections of a universe the slow way."""
+    graph: Dict[unchaind_universe.System, Set[unchaind_universe.System]] = {}
+
+    for connection in universe.connections.values():
+        graph.setdefault(connection.left, set()).add(connection.right)
+        graph.setdefault(connection.right, set()).add(connection.left)
+
+    return graph
+
+
+def assert_consistent(universe: unchaind_universe.Universe) -> None:
+    graph = naive_graph(universe)
+
+    assert {k: set(v) for k, v in universe.graph.items()} == graph
+    assert set(universe.systems) == set(graph)
+
+    for system, neighbors in graph.items():
+        assert universe.degree(system) == len(neighbors)
+
+
 class UniverseTest(unittest.TestCase):
     def test_universe_connection_add(self) -> None:
         universe = loop.run_until_complete(
@@ -122,3 +150,479 @@ class UniverseTest(unittest.TestCase):
 
         with self.assertRaises(KeyError):
             unchaind_universe.System(1)
+
+    def test_universe_system_interned(self) -> None:
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_492)
+        system3 = unchaind_universe.System(30_000_493)
+
+        self.assertIs(system1, system2)
+        self.assertEqual(system1, system2)
+        self.assertNotEqual(system1, system3)
+
+        self.assertIs(copy.copy(system1), system1)
+        self.assertIs(pickle.loads(pickle.dumps(system1)), system1)
+
+        with self.assertRaises(AttributeError):
+            system1.color = "blue"  # type: ignore
+
+    def test_universe_system_bands(self) -> None:
+        jita = unchaind_universe.System(30_000_142)
+        j100820 = unchaind_universe.System(31_002_479)
+
+        self.assertFalse(jita.wspace)
+        self.assertEqual(jita.security, "high")
+
+        self.assertTrue(j100820.wspace)
+        self.assertEqual(j100820.security, "null")
+
+        for identifier in unchaind_static.truesec:
+            system = unchaind_universe.System(identifier)
+
+            if system.truesec >= 0.45:
+                self.assertEqual(system.security, "high")
+            elif system.truesec > 0.0:
+                self.assertEqual(system.security, "low")
+            elif system.truesec < 0.0:
+                self.assertEqual(system.security, "null")
+
+    def test_state_flags(self) -> None:
+        state = unchaind_universe.State()
+
+        self.assertFalse(state.wormhole)
+
+        state.wormhole = True
+        state.end_of_life = True
+
+        self.assertTrue(state.wormhole)
+        self.assertTrue(
+            state.test(
+                unchaind_universe.State.WORMHOLE
+                | unchaind_universe.State.END_OF_LIFE
+            )
+        )
+        self.assertFalse(
+            state.test(
+                unchaind_universe.State.WORMHOLE
+                | unchaind_universe.State.CRITICAL_MASS
+            )
+        )
+        self.assertTrue(
+            state.test_any(
+                unchaind_universe.State.STARGATE
+                | unchaind_universe.State.END_OF_LIFE
+            )
+        )
+
+        state.end_of_life = False
+
+        self.assertEqual(state, unchaind_universe.State.WORMHOLE)
+        self.assertEqual(
+            state, unchaind_universe.State(unchaind_universe.State.WORMHOLE)
+        )
+        self.assertEqual(
+            hash(state),
+            hash(unchaind_universe.State(unchaind_universe.State.WORMHOLE)),
+        )
+
+    def test_connection_type(self) -> None:
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+
+        state = unchaind_universe.State()
+        conn = unchaind_universe.Connection(system1, system2, state)
+
+        self.assertEqual(conn.type, "")
+
+        state.wormhole = True
+        self.assertEqual(conn.type, "wormhole")
+
+        state.stargate = True
+        self.assertEqual(conn.type, "stargate")
+
+    def test_universe_connections_with(self) -> None:
+        universe = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+        system3 = unchaind_universe.System(30_000_494)
+
+        stable = unchaind_universe.State(unchaind_universe.State.WORMHOLE)
+        eol = unchaind_universe.State(
+            unchaind_universe.State.WORMHOLE
+            | unchaind_universe.State.END_OF_LIFE
+        )
+
+        conn1 = unchaind_universe.Connection(system1, system2, stable)
+        conn2 = unchaind_universe.Connection(system1, system3, eol)
+
+        loop.run_until_complete(universe.connect(conn1))
+        loop.run_until_complete(universe.connect(conn2))
+
+        self.assertEqual(
+            list(
+                universe.connections_with(
+                    unchaind_universe.State.WORMHOLE,
+                    unchaind_universe.State.END_OF_LIFE,
+                )
+            ),
+            [conn1],
+        )
+
+        filtered = universe.filtered(
+            exclude=unchaind_universe.State.END_OF_LIFE
+        )
+
+        self.assertEqual(list(filtered.connections.values()), [conn1])
+        self.assertEqual(len(universe.connections), 2)
+
+    def test_universe_graph_after_update_with(self) -> None:
+        universe1 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+        universe2 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        state = unchaind_universe.State()
+
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+        system3 = unchaind_universe.System(30_000_494)
+        system4 = unchaind_universe.System(30_000_495)
+
+        conn1 = unchaind_universe.Connection(system1, system2, state)
+        conn2 = unchaind_universe.Connection(system1, system3, state)
+        conn3 = unchaind_universe.Connection(system2, system3, state)
+        conn4 = unchaind_universe.Connection(system3, system4, state)
+
+        loop.run_until_complete(universe1.connect(conn1))
+        loop.run_until_complete(universe1.connect(conn2))
+        loop.run_until_complete(universe1.connect(conn3))
+
+        loop.run_until_complete(universe2.update_with(universe1))
+        assert_consistent(universe2)
+
+        self.assertEqual(set(universe2.graph[system1]), {system2, system3})
+
+        # Replace a connection, system1 loses one neighbor and system4 shows
+        # up while system2 stays through conn3
+        loop.run_until_complete(universe1.disconnect(conn1))
+        loop.run_until_complete(universe1.connect(conn4))
+
+        loop.run_until_complete(universe2.update_with(universe1))
+        assert_consistent(universe2)
+
+        self.assertEqual(set(universe2.graph[system1]), {system3})
+        self.assertEqual(universe2.degree(system3), 3)
+        self.assertIn(system4, universe2.systems)
+
+        # Empty it out again, no system should be left behind
+        empty = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        loop.run_until_complete(universe2.update_with(empty))
+        assert_consistent(universe2)
+
+        self.assertEqual(len(universe2.systems), 0)
+        self.assertEqual(universe2.degree(system1), 0)
+
+    def test_universe_graph_from_eve(self) -> None:
+        universe = loop.run_until_complete(
+            unchaind_universe.Universe.from_eve()
+        )
+
+        assert_consistent(universe)
+
+    def test_multiverse_refresh(self) -> None:
+        universe1 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+        universe2 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        state = unchaind_universe.State()
+
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+        system3 = unchaind_universe.System(30_000_494)
+
+        conn1 = unchaind_universe.Connection(system1, system2, state)
+        conn2 = unchaind_universe.Connection(system2, system3, state)
+
+        loop.run_until_complete(universe1.connect(conn1))
+
+        multiverse = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(universe1, universe2)
+        )
+
+        self.assertEqual(len(multiverse.connections), 1)
+        version = multiverse.version
+
+        # Nothing changed so nothing happens
+        self.assertFalse(multiverse.stale)
+        self.assertFalse(loop.run_until_complete(multiverse.refresh()))
+        self.assertEqual(multiverse.version, version)
+
+        loop.run_until_complete(universe2.connect(conn2))
+
+        self.assertTrue(multiverse.stale)
+        self.assertTrue(loop.run_until_complete(multiverse.refresh()))
+        self.assertGreater(multiverse.version, version)
+
+        self.assertEqual(len(multiverse.connections), 2)
+        self.assertEqual(set(multiverse.graph[system2]), {system1, system3})
+        assert_consistent(multiverse)
+
+        loop.run_until_complete(universe1.disconnect(conn1))
+        loop.run_until_complete(multiverse.refresh())
+
+        self.assertEqual(list(multiverse.connections.values()), [conn2])
+        assert_consistent(multiverse)
+
+    def test_multiverse_duplicate(self) -> None:
+        universe1 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+        universe2 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+
+        conn1 = unchaind_universe.Connection(
+            system1, system2, unchaind_universe.State()
+        )
+        conn2 = unchaind_universe.Connection(
+            system2, system1, unchaind_universe.State()
+        )
+
+        loop.run_until_complete(universe1.connect(conn1))
+        loop.run_until_complete(universe2.connect(conn2))
+
+        multiverse = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(universe1, universe2)
+        )
+
+        self.assertEqual(list(multiverse.connections.values()), [conn1])
+
+    def test_delta_changed(self) -> None:
+        universe1 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+        universe2 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+
+        conn1 = unchaind_universe.Connection(
+            system1, system2, unchaind_universe.State()
+        )
+        conn2 = unchaind_universe.Connection(
+            system1,
+            system2,
+            unchaind_universe.State(unchaind_universe.State.END_OF_LIFE),
+        )
+
+        loop.run_until_complete(universe1.connect(conn1))
+        loop.run_until_complete(universe2.connect(conn2))
+
+        delta = unchaind_universe.Delta.from_universes(universe1, universe2)
+
+        self.assertEqual(delta.connections_add, set())
+        self.assertEqual(delta.connections_del, set())
+        self.assertEqual(delta.connections_changed, {conn2})
+
+        loop.run_until_complete(universe1.update_with(universe2))
+
+        self.assertIs(
+            universe1.connections[frozenset([system1, system2])], conn2
+        )
+        assert_consistent(universe1)
+
+    def test_universe_changes_since(self) -> None:
+        universe1 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+        system3 = unchaind_universe.System(30_000_494)
+        system4 = unchaind_universe.System(30_000_495)
+
+        state = unchaind_universe.State(unchaind_universe.State.WORMHOLE)
+        eol = unchaind_universe.State(
+            unchaind_universe.State.WORMHOLE
+            | unchaind_universe.State.END_OF_LIFE
+        )
+
+        conn1 = unchaind_universe.Connection(system1, system2, state)
+        conn2 = unchaind_universe.Connection(system1, system3, state)
+        conn3 = unchaind_universe.Connection(system2, system3, state)
+        conn4 = unchaind_universe.Connection(system3, system4, state)
+        conn1_eol = unchaind_universe.Connection(system1, system2, eol)
+
+        loop.run_until_complete(universe1.connect(conn1))
+        loop.run_until_complete(universe1.connect(conn2))
+
+        version = universe1.version
+
+        # Nothing happened yet
+        delta = universe1.changes_since(version)
+        assert delta is not None
+
+        self.assertEqual(delta.connections_add, set())
+        self.assertEqual(delta.connections_del, set())
+        self.assertEqual(delta.connections_changed, set())
+
+        # One added, one removed, one that came and went, one changed
+        loop.run_until_complete(universe1.connect(conn3))
+        loop.run_until_complete(universe1.disconnect(conn2))
+        loop.run_until_complete(universe1.connect(conn4))
+        loop.run_until_complete(universe1.disconnect(conn4))
+
+        universe2 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+        loop.run_until_complete(universe2.connect(conn1_eol))
+        loop.run_until_complete(universe2.connect(conn3))
+        loop.run_until_complete(universe1.update_with(universe2))
+
+        delta = universe1.changes_since(version)
+        assert delta is not None
+
+        self.assertEqual(delta.connections_add, {conn3})
+        self.assertEqual(delta.connections_del, {conn2})
+        self.assertEqual(delta.connections_changed, {conn1_eol})
+
+        # A copy of the universe as it was catches up with only the delta
+        copy1 = unchaind_universe.Universe.from_empty_sync()
+        copy1.connect_sync(conn1)
+        copy1.connect_sync(conn2)
+        copy1.apply_sync(delta)
+
+        self.assertEqual(copy1.connections, universe1.connections)
+        assert_consistent(copy1)
+
+        # Versions from the future or too far in the past are unknown
+        self.assertIsNone(universe1.changes_since(universe1.version + 1))
+
+        universe1._LOG_SIZE = 2
+
+        loop.run_until_complete(universe1.disconnect(conn3))
+        loop.run_until_complete(universe1.connect(conn3))
+        loop.run_until_complete(universe1.disconnect(conn3))
+
+        self.assertIsNone(universe1.changes_since(version))
+        self.assertIsNotNone(universe1.changes_since(universe1.version - 1))
+
+    def test_multiverse_refresh_patch(self) -> None:
+        universe1 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+        universe2 = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        system1 = unchaind_universe.System(30_000_492)
+        system2 = unchaind_universe.System(30_000_493)
+        system3 = unchaind_universe.System(30_000_494)
+
+        state = unchaind_universe.State()
+
+        conn1 = unchaind_universe.Connection(system1, system2, state)
+        conn1_other = unchaind_universe.Connection(system2, system1, state)
+        conn2 = unchaind_universe.Connection(system2, system3, state)
+
+        loop.run_until_complete(universe1.connect(conn1))
+        loop.run_until_complete(universe2.connect(conn1_other))
+
+        multiverse = loop.run_until_complete(
+            unchaind_universe.Multiverse.from_universes(universe1, universe2)
+        )
+        version = multiverse.version
+
+        loop.run_until_complete(universe2.connect(conn2))
+        loop.run_until_complete(universe1.disconnect(conn1))
+        loop.run_until_complete(multiverse.refresh())
+
+        # The connection of the second member takes over
+        self.assertEqual(
+            set(multiverse.connections.values()), {conn1_other, conn2}
+        )
+        assert_consistent(multiverse)
+
+        delta = multiverse.changes_since(version)
+        assert delta is not None
+
+        self.assertEqual(delta.connections_add, {conn2})
+        self.assertEqual(delta.connections_del, set())
+
+    def test_universe_eve(self) -> None:
+        universe = unchaind_universe.Universe.eve()
+
+        self.assertIs(universe, unchaind_universe.Universe.eve())
+        self.assertEqual(
+            len(universe.connections),
+            len(list(unchaind_static.stargate_graph().edges())),
+        )
+
+        system1 = unchaind_universe.System(30_000_001)
+        system2 = unchaind_universe.System(30_000_003)
+
+        connection = universe.connections[frozenset([system1, system2])]
+        self.assertEqual(connection.type, "stargate")
+
+        with self.assertRaises(unchaind_exception.UniverseFrozen):
+            universe.disconnect_sync(connection)
+
+        with self.assertRaises(unchaind_exception.UniverseFrozen):
+            universe.connect_sync(
+                unchaind_universe.Connection(
+                    unchaind_universe.System(30_000_492),
+                    unchaind_universe.System(31_002_479),
+                    unchaind_universe.State(),
+                )
+            )
+
+    def test_multiverse_eve_overlay(self) -> None:
+        chain = loop.run_until_complete(
+            unchaind_universe.Universe.from_empty()
+        )
+
+        system1 = unchaind_universe.System(30_002_187)
+        system2 = unchaind_universe.System(31_002_479)
+
+        conn1 = unchaind_universe.Connection(
+            system1,
+            system2,
+            unchaind_universe.State(unchaind_universe.State.WORMHOLE),
+        )
+
+        multiverse = unchaind_universe.Multiverse.from_universes_sync(
+            unchaind_universe.Universe.eve(), chain
+        )
+
+        self.assertNotIn(system2, multiverse.systems)
+
+        chain.connect_sync(conn1)
+        multiverse.refresh_sync()
+
+        self.assertIn(system2, multiverse.systems)
+        self.assertIn(system2, multiverse.graph[system1])
+        self.assertEqual(
+            len(multiverse.connections),
+            len(unchaind_universe.Universe.eve().connections) + 1,
+        )
+
+        # The shared universe is left alone
+        self.assertNotIn(system2, unchaind_universe.Universe.eve().systems)
+
+        assert_consistent(multiverse)
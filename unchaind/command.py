@@ -1,7 +1,6 @@
 """The command you can actually run from your command line."""
 import logging
 
-from asyncio import gather
 from typing import Dict, Any, Optional, Union
 
 import click
@@ -9,11 +8,14 @@ import functools
 
 from tornado import ioloop
 
+import unchaind.static as static
+
 from unchaind.mapper.siggy import Map as SiggyMapper
 from unchaind.mapper.evescout import Map as EVEScoutMapper
 
-from unchaind.universe import Universe, State, Connection, System
-from unchaind.notifier.kill import loop as loop_kills
+from unchaind.universe import Universe, Multiverse, State, Connection, System
+from unchaind.path import jumps_from_home
+from unchaind.notifier.pipeline import Pipeline
 from unchaind.notifier.kill import process_one_killmail as oneshot_kill
 from unchaind.notifier.system import periodic as periodic_systems
 from unchaind.util import get_mapper, get_transport
@@ -30,13 +32,12 @@ async def universe_cleanup(universe: Universe) -> Universe:
 
     # First we delete all connections where one of these goes towards a
     # filtered destination
-    await gather(
-        *[
-            universe.disconnect(universe.connections[c])
-            for c in universe.connections
-            if any(s.identifier == 30_000_362 for s in c)
-        ]
-    )
+    for connection in [
+        universe.connections[c]
+        for c in universe.connections
+        if any(s.identifier == 30_000_362 for s in c)
+    ]:
+        universe.disconnect_sync(connection)
 
     return universe
 
@@ -46,6 +47,7 @@ class Command:
        setup all the mappers."""
 
     universes: Dict[str, Universe]
+    multiverse: Multiverse
     mappers: Dict[str, Union[SiggyMapper, EVEScoutMapper]]
 
     def __init__(self, config: Dict[str, Any]) -> None:
@@ -74,7 +76,7 @@ class Command:
 
                 connection = Connection(left, right, state)
 
-                await self.universes["_path"].connect(connection)
+                self.universes["_path"].connect_sync(connection)
 
         if "mapper" in self.config and len(self.config["mapper"]):
             log.info(
@@ -109,6 +111,16 @@ class Command:
                 len(self.mappers),
             )
 
+        # All our universes exist now, the notifiers look at them through a
+        # multiverse that keeps itself up to date with them
+        self.multiverse = Multiverse.from_universes_sync(
+            *self.universes.values()
+        )
+
+        if self.config.get("home_system"):
+            self.multiverse.home = System(self.config["home_system"])
+
+        if self.mappers:
             # Run our initial pass to get all the results without firing their
             # callbacks since we're booting
             await self.periodic_mappers()
@@ -125,11 +137,16 @@ class Command:
         to load up our Universe, then runs kill notifiers/matchers as configured.
         Intended for debugging/testing/development."""
         await self._initialize()
-        await oneshot_kill(killmail_str, self.config, self.universes)
+        await oneshot_kill(killmail_str, self.config, self.multiverse)
 
     async def daemon(self) -> None:
         """Long-running loop that periodically runs all configured mappers,
         subscribers, and notifiers."""
+
+        # We're going to be running for a while, load the static universe
+        # data now instead of on the first killmail that needs it
+        static.warm()
+
         await self._initialize()
 
         loop: ioloop.IOLoop = ioloop.IOLoop.current()
@@ -206,24 +223,28 @@ class Command:
                 )
                 continue
 
-            await self.universes[name].update_with(universe)
+            self.universes[name].update_with_sync(universe)
+
+        # Keep the distances from home current so killmails only have to
+        # look them up, this only costs the changes to our chains
+        if self.multiverse.home:
+            jumps_from_home(self.multiverse, self.multiverse.home)
 
         log.debug("periodic_mappers: done")
 
     async def periodic_systems(self) -> None:
         """Call loop for our systems with our current Universes."""
         log.debug("periodic_systems: running")
-        await periodic_systems(self.config, self.universes)
+        await periodic_systems(self.config, self.multiverse)
         log.debug("periodic_systems: done")
 
     async def loop_kills(self) -> None:
-        """Call loop for our killboard provider with our current Universe. The
-           killboard provider matches kills to systems in the Universe and can
-           notify channels if anything happens."""
+        """Run the kill pipeline for our killboard provider with our current
+           Universe. The pipeline matches kills to systems in the Universe
+           and can notify channels if anything happens."""
 
-        while True:
-            log.debug("loop_kills: running")
-            await loop_kills(self.config, self.universes)
+        log.debug("loop_kills: running")
+        await Pipeline.from_config(self.config, self.multiverse).run()
 
 
 @click.command()
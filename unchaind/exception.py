@@ -14,3 +14,7 @@ class ConnectionDuplicate(Exception):
 
 class ConnectionNonexistent(Exception):
     pass
+
+
+class UniverseFrozen(Exception):
+    pass
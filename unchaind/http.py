@@ -1,7 +1,9 @@
 """Provides a HTTP class which can be used from to make cookies persist
    over requests and add some additional logging."""
 
-from typing import Dict, Any
+import logging
+
+from typing import Dict, Any, Optional
 from http.cookies import SimpleCookie
 
 from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPResponse
@@ -9,6 +11,26 @@ from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPResponse
 from unchaind.constant import DEFAULT_HEADERS
 
 
+log = logging.getLogger(__name__)
+
+
+def keep_alive_client() -> AsyncHTTPClient:
+    """A client of its own that keeps connections open between requests.
+       Tornado's default client closes its connection after every request,
+       curl doesn't. Without pycurl installed this falls back to the default
+       client, install `unchaind[curl]` to get it."""
+    try:
+        from tornado.curl_httpclient import CurlAsyncHTTPClient
+    except ImportError:
+        log.warning(
+            "keep_alive_client: pycurl is not installed, connections are "
+            "not kept alive"
+        )
+        return AsyncHTTPClient(force_instance=True)
+
+    return CurlAsyncHTTPClient(force_instance=True)
+
+
 class HTTPSession:
     """Small HTTP session wrapper to keep cookie state over multiple
        requests."""
@@ -17,9 +39,9 @@ class HTTPSession:
     http_client: AsyncHTTPClient
     referer: str
 
-    def __init__(self) -> None:
+    def __init__(self, http_client: Optional[AsyncHTTPClient] = None) -> None:
         self.cookies = {}
-        self.http_client = AsyncHTTPClient()
+        self.http_client = http_client or AsyncHTTPClient()
         self.referer = ""
 
     async def request(self, *args: Any, **kwargs: Any) -> HTTPResponse:
@@ -42,7 +42,7 @@ class Map:
         for connection in data:
             state = State()
 
-            await universe.connect(
+            universe.connect_sync(
                 Connection(
                     System(connection["source_solar_system"]["id"]),
                     System(connection["destination_solar_system"]["id"]),
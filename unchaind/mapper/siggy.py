@@ -55,7 +55,7 @@ class Map:
             state = State()
             state.end_of_life = bool(connection.get("eol", 0))
 
-            await universe.connect(
+            universe.connect_sync(
                 Connection(
                     System(connection["from_system_id"]),
                     System(connection["to_system_id"]),
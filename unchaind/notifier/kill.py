@@ -1,60 +1,91 @@
 """Functions to interface with killboards."""
+import asyncio
 import logging
 import json
-import re
 
-from typing import Dict, Any, List, Callable
+from typing import (
+    Dict,
+    Any,
+    List,
+    Callable,
+    Optional,
+    Tuple,
+    Awaitable,
+    FrozenSet,
+    Set,
+    Iterator,
+)
 from asyncio import gather
+from urllib.parse import urlencode
 
-from unchaind.http import HTTPSession
-from unchaind.util.kill import payload_for_killmail
+from unchaind import static
+from unchaind.http import HTTPSession, keep_alive_client
+from unchaind.util.kill import Enrichment
 from unchaind.universe import System, Universe, Multiverse
+from unchaind.path import Distances, distances, chain_distances
 from unchaind.sink import sinks
 
 
 log = logging.getLogger(__name__)
 
 
-async def process_one_killmail(
-    killmail_str: str, config: Dict[str, Any], universes: Dict[str, Universe]
-) -> None:
-    """Attempt to parse killmail_str as zkb-provided JSON, then invokes
-    appropriate matchers & notifiers as configured"""
-
-    universe = await Multiverse.from_universes(*universes.values())
+def parse_killmail(killmail_str: str) -> Optional[Dict[str, Any]]:
+    """Parse killmail_str as zkb-provided JSON, returns the package with the
+       killmail in it or None if there isn't one."""
 
     try:
         data = json.loads(killmail_str)
     except ValueError:
         log.warning(
-            "process_one_killmail: received invalid JSON (%r)", killmail_str
+            "parse_killmail: received invalid JSON (%r)", killmail_str
         )
-        return
+        return None
 
     if "package" not in data:
         log.warning(
-            "process_one_killmail: did not contain 'package' key (%r)",
+            "parse_killmail: did not contain 'package' key (%r)",
             killmail_str,
         )
-        return
+        return None
 
     package = data.get("package", None)
 
     if not package:
-        log.debug("process_one_killmail: the package was empty")
-        return
+        log.debug("parse_killmail: the package was empty")
+        return None
 
-    try:
-        killmail = package["killmail"]
-    except KeyError:
+    if "killmail" not in package:
         log.warning(
-            "process_one_killmail: received unparseable killmail from zkillboard (%r)",
+            "parse_killmail: received unparseable killmail from zkillboard (%r)",
             killmail_str,
         )
+        return None
+
+    return dict(package)
+
+
+def killmail_message(package: Dict[str, Any]) -> str:
+    """The plain message for a killmail, for sinks without a payload."""
+    kill_id = package["killmail"]["killmail_id"]
+    return f"https://zkillboard.com/kill/{kill_id}/"
+
+
+async def process_one_killmail(
+    killmail_str: str, config: Dict[str, Any], multiverse: Multiverse
+) -> None:
+    """Attempt to parse killmail_str as zkb-provided JSON, then invokes
+    appropriate matchers & notifiers as configured"""
+
+    multiverse.refresh_sync()
+    universe = multiverse
+
+    package = parse_killmail(killmail_str)
+
+    if package is None:
         return
 
-    kill_id = killmail["killmail_id"]
-    message = f"https://zkillboard.com/kill/{kill_id}/"
+    kill_id = package["killmail"]["killmail_id"]
+    message = killmail_message(package)
 
     # Find any matching notifiers
     matches = await match_killmail(config, universe, package)
@@ -63,164 +94,483 @@ async def process_one_killmail(
         log.debug(f"process_one_killmail: no matches for %d", kill_id)
         return
 
+    # Enrich once for all the notifiers that matched
+    enrichment = Enrichment(package, universe)
+    payloads = await gather(*[enrichment.payload(match) for match in matches])
+
     await gather(
         *[
-            sinks[match["type"]](
-                match,
-                message,
-                payload=await payload_for_killmail[match["type"]](
-                    match, package, universe
-                )
-                if match["type"] in payload_for_killmail
-                else None,
-            )
-            for match in matches
+            sinks[match["type"]](match, message, payload=payload)
+            for match, payload in zip(matches, payloads)
         ]
     )
 
 
-async def loop(config: Dict[str, Any], universes: Dict[str, Universe]) -> None:
+class RedisQ:
+    """A long lived consumer of the zkillboard RedisQ. All polls go through
+       one HTTPSession on a client of its own that keeps the connection to
+       zkillboard open between polls, as long as pycurl is installed. With
+       a `queue_id` zkillboard keeps the kills that come in between polls
+       for us and `ttw` is how long a poll waits for a kill before it
+       returns empty.
+
+       When a poll doesn't get a kill or an empty answer from zkillboard we
+       wait before the next one, twice as long every time it happens again
+       in a row."""
+
+    URL = "https://redisq.zkillboard.com/listen.php"
+
+    http: HTTPSession
+    url: str
+    queue_id: Optional[str]
+    ttw: int
+
+    backoff: float
+    backoff_max: float
+
+    # How long we are waiting before the next poll right now
+    delay: float
+
+    def __init__(
+        self,
+        queue_id: Optional[str] = None,
+        ttw: int = 10,
+        url: str = URL,
+        backoff: float = 1.0,
+        backoff_max: float = 300.0,
+    ) -> None:
+        self.http = HTTPSession(keep_alive_client())
+        self.url = url
+        self.queue_id = queue_id
+        self.ttw = ttw
+
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+        self.delay = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RedisQ":
+        """Create a consumer from the optional `redisq` section of our
+           configuration."""
+        section = config.get("redisq", {})
+
+        return cls(
+            queue_id=section.get("queue_id"),
+            ttw=int(section.get("ttw", 10)),
+            url=section.get("url", cls.URL),
+        )
+
+    @property
+    def listen_url(self) -> str:
+        params: Dict[str, Any] = {"ttw": self.ttw}
+
+        if self.queue_id:
+            params["queueID"] = self.queue_id
+
+        return f"{self.url}?{urlencode(params)}"
+
+    async def poll(self) -> Optional[str]:
+        """Wait for the next kill and return the body of the response. None
+           if there was no usable response, after backing off."""
+
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+        try:
+            response = await self.http.request(
+                url=self.listen_url,
+                method="GET",
+                request_timeout=self.ttw + 20,
+            )
+        except Exception as err:
+            log.warning("poll: zkillboard fetch threw %s", err, exc_info=err)
+            self._back_off()
+            return None
+
+        if response.code != 200:
+            # Keep hammering zkillboard after a 429 and our IP is likely to
+            # get banned for a day, any other answer we can't use is no
+            # reason to ask again right away either
+            log.warning("poll: received response code %s", response.code)
+            self._back_off(response.headers.get("Retry-After"))
+            return None
+
+        self.delay = 0.0
+
+        try:
+            return str(response.body.decode("utf-8"))
+        except UnicodeDecodeError as err:
+            log.warning("poll: %s (%r)", err, response.body, exc_info=err)
+            return None
+
+    def close(self) -> None:
+        """Close the connections of the consumer, it can't poll after."""
+        self.http.http_client.close()
+
+    def _back_off(self, retry_after: Optional[str] = None) -> None:
+        self.delay = min(max(self.delay * 2, self.backoff), self.backoff_max)
+
+        if retry_after is not None and retry_after.isdigit():
+            self.delay = max(self.delay, float(retry_after))
+
+        log.info("_back_off: waiting %.1fs before the next poll", self.delay)
+
+
+async def loop(
+    config: Dict[str, Any],
+    multiverse: Multiverse,
+    redisq: Optional[RedisQ] = None,
+) -> None:
     """Run a single iteration of the zkillboard RedisQ API which lists all
-       kills then we filter those kills."""
+       kills then we filter those kills. Pass a RedisQ to keep using the
+       same one."""
 
-    http = HTTPSession()
+    if redisq is None:
+        # Nobody keeps this one around, don't leave its connections open
+        redisq = RedisQ.from_config(config)
 
-    try:
-        response = await http.request(
-            url="https://redisq.zkillboard.com/listen.php", method="GET"
-        )
-    except Exception as err:
-        log.warning("loop: zkillboard fetch threw %s", err, exc_info=err)
-        return
+        try:
+            killmail_str = await redisq.poll()
+        finally:
+            redisq.close()
+    else:
+        killmail_str = await redisq.poll()
 
-    if response.code != 200:
-        # TODO: on a 429 we might want to just exit immediately, as it often
-        # means our IP is about to get banned for a day (!)
-        log.warning("loop: received response code %s", response.code)
+    if killmail_str is None:
         return
 
-    try:
-        killmail_str = response.body.decode("utf-8")
-    except UnicodeDecodeError as err:
-        log.warning("loop: %s (%r)", err, response.body, exc_info=err)
-        return
+    await process_one_killmail(killmail_str, config, multiverse)
+
+
+def _solar_system(package: Dict[str, Any]) -> System:
+    return System(package["killmail"].get("solar_system_id", None))
+
+
+class Kill:
+    """A killmail package that is being matched and the universe it is
+       matched against. What the matchers need from the package is gathered
+       on first use and then shared by all of them."""
+
+    __slots__ = ("package", "universe", "_solar_system", "_entities")
+
+    package: Dict[str, Any]
+    universe: Universe
 
-    await process_one_killmail(killmail_str, config, universes)
+    _solar_system: Optional[System]
+    _entities: Optional["Entities"]
 
+    def __init__(self, package: Dict[str, Any], universe: Universe) -> None:
+        self.package = package
+        self.universe = universe
 
-async def _match_location(
-    value: str, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    solar_system = System(killmail.get("solar_system_id", None))
+        self._solar_system = None
+        self._entities = None
 
+    @property
+    def solar_system(self) -> System:
+        if self._solar_system is None:
+            self._solar_system = _solar_system(self.package)
+
+        return self._solar_system
+
+    @property
+    def entities(self) -> "Entities":
+        if self._entities is None:
+            self._entities = Entities(self.package)
+
+        return self._entities
+
+
+# A compiled matcher, tells whether a kill matches
+Predicate = Callable[[Kill], bool]
+
+
+def _location(value: str) -> Predicate:
     if value == "chain":
-        return solar_system in universe.systems
+        return lambda kill: kill.solar_system in kill.universe.systems
 
     if value == "wspace":
-        return bool(re.match(r"J\d{6}", solar_system.name))
+        return lambda kill: kill.solar_system.wspace
+
+    lowered = value.lower()
+
+    return lambda kill: lowered == kill.solar_system.name.lower()
+
 
-    return value.lower() == solar_system.name.lower()
+def _system_of(value: Any) -> Optional[System]:
+    """A system by its identifier or by its name in any case, None if there
+       is no such system."""
+    if isinstance(value, int) or str(value).isdigit():
+        identifier: Optional[int] = int(value)
+    else:
+        lowered = str(value).lower()
+        identifier = next(
+            (i for i, name in static.systems.items() if name.lower() == lowered),
+            None,
+        )
+
+    if identifier is None or identifier not in static.systems:
+        return None
+
+    return System(identifier)
+
+
+def _within_jumps(value: Dict[str, Any]) -> Predicate:
+    of = value.get("of", "chain")
+    jumps = int(value["jumps"])
+
+    # Anything but our chains or home is a system to count from
+    source: Optional[System] = None
 
+    if of not in ("chain", "home"):
+        source = _system_of(of)
 
-async def _match_security_status(
-    value: str, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    solar_system = System(killmail.get("solar_system_id", None))
+        if source is None:
+            raise ValueError(f"within_jumps: unknown system {of!r}")
 
-    value = value.lower()
+    def predicate(kill: Kill) -> bool:
+        universe = kill.universe
+        table: Distances
 
-    if value in ("high", "highsec"):
-        return solar_system.truesec >= 0.45
-    if value in ("low", "lowsec"):
-        return 0.0 < solar_system.truesec < 0.45
-    if value in ("null", "nullsec"):
-        return solar_system.truesec < 0.0
+        if source is not None:
+            table = distances(universe.with_eve(), [source])
+        elif of == "chain":
+            table = chain_distances(universe)
+        elif of == "home":
+            if not isinstance(universe, Multiverse) or universe.home is None:
+                log.warning("within_jumps: there is no home system configured")
+                return False
 
-    log.warning("unknown security status '%s'", value)
-    return False
+            table = distances(universe.with_eve(), [universe.home])
 
+        distance = table.get(kill.solar_system)
+
+        return distance is not None and distance <= jumps
+
+    return predicate
+
+
+# The security bands of the security matcher by the names it accepts
+_SECURITY = {
+    "high": "high",
+    "highsec": "high",
+    "low": "low",
+    "lowsec": "low",
+    "null": "null",
+    "nullsec": "null",
+}
 
-async def _match_alliance(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    return await _match_alliance_loss(
-        value, package, universe
-    ) or await _match_alliance_kill(value, package, universe)
 
+def _security_status(value: str) -> Predicate:
+    band = _SECURITY.get(value.lower())
 
-async def _match_alliance_kill(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    attackers = killmail.get("attackers", [])
-    return any(a.get("alliance_id", None) == value for a in attackers)
+    if band is None:
+        log.warning("unknown security status '%s'", value)
+        return lambda kill: False
 
+    return lambda kill: kill.solar_system.security == band
 
-async def _match_alliance_loss(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    return bool(killmail["victim"].get("alliance_id", None) == value)
 
+# An entity on one side of a killmail, as ("kill" or "loss", the key of the
+# entity id in the killmail and the id)
+EntityKey = Tuple[str, str, int]
 
-async def _match_corporation(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    return await _match_corporation_loss(
-        value, package, universe
-    ) or await _match_corporation_kill(value, package, universe)
+ENTITIES = ("alliance_id", "corporation_id", "character_id")
 
 
-async def _match_corporation_kill(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    attackers = killmail.get("attackers", [])
-    return any(c.get("corporation_id", None) == value for c in attackers)
+class Entities:
+    """The alliances, corporations and characters on both sides of a
+       killmail, gathered once so matchers look them up in sets instead of
+       going over all attackers."""
+
+    __slots__ = ("kill", "loss")
+
+    kill: Dict[str, FrozenSet[int]]
+    loss: Dict[str, FrozenSet[int]]
+
+    def __init__(self, package: Dict[str, Any]) -> None:
+        killmail = package["killmail"]
+        victim = killmail.get("victim", {})
+        attackers = killmail.get("attackers", [])
+
+        self.kill = {
+            key: frozenset(a[key] for a in attackers if key in a)
+            for key in ENTITIES
+        }
+        self.loss = {
+            key: frozenset([victim[key]] if key in victim else [])
+            for key in ENTITIES
+        }
+
+    def __len__(self) -> int:
+        return sum(map(len, self.kill.values())) + sum(
+            map(len, self.loss.values())
+        )
+
+    def __contains__(self, entity: object) -> bool:
+        if not isinstance(entity, tuple):
+            return False
 
+        side, key, value = entity
 
-async def _match_corporation_loss(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    return bool(killmail["victim"]["corporation_id"] == value)
+        return value in (self.kill if side == "kill" else self.loss)[key]
 
+    def __iter__(self) -> Iterator[EntityKey]:
+        for side, table in (("kill", self.kill), ("loss", self.loss)):
+            for key, values in table.items():
+                for value in values:
+                    yield side, key, value
 
-async def _match_character(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    return await _match_character_loss(
-        value, package, universe
-    ) or await _match_character_kill(value, package, universe)
 
+def _kill(key: str) -> Callable[[int], Predicate]:
+    """Match an entity id on the attacker side of a killmail."""
 
-async def _match_character_kill(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    attackers = killmail.get("attackers", [])
-    return any(c.get("character_id", None) == value for c in attackers)
+    def compile(value: int) -> Predicate:
+        return lambda kill: value in kill.entities.kill[key]
 
+    return compile
 
-async def _match_character_loss(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    killmail = package["killmail"]
-    return bool(killmail["victim"]["character_id"] == value)
 
+def _loss(key: str) -> Callable[[int], Predicate]:
+    """Match an entity id on the victim side of a killmail."""
 
-async def _match_minimum_value(
-    value: int, package: Dict[str, Any], universe: Universe
-) -> bool:
-    kill_value = package["zkb"]["totalValue"]
-    return bool(kill_value >= value)
+    def compile(value: int) -> Predicate:
+        return lambda kill: value in kill.entities.loss[key]
 
+    return compile
+
+
+def _either(key: str) -> Callable[[int], Predicate]:
+    """Match an entity id on either side of a killmail."""
+
+    def compile(value: int) -> Predicate:
+        def predicate(kill: Kill) -> bool:
+            entities = kill.entities
+            return value in entities.loss[key] or value in entities.kill[key]
+
+        return predicate
+
+    return compile
+
+
+# The entity matchers by name with the entity they look at and on which
+# sides of the killmail
+_entity_matchers: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "alliance": ("alliance_id", ("kill", "loss")),
+    "alliance_kill": ("alliance_id", ("kill",)),
+    "alliance_loss": ("alliance_id", ("loss",)),
+    "corporation": ("corporation_id", ("kill", "loss")),
+    "corporation_kill": ("corporation_id", ("kill",)),
+    "corporation_loss": ("corporation_id", ("loss",)),
+    "character": ("character_id", ("kill", "loss")),
+    "character_kill": ("character_id", ("kill",)),
+    "character_loss": ("character_id", ("loss",)),
+}
+
+
+def _entity_keys(name: str, value: Any) -> Optional[Set[EntityKey]]:
+    """The entities a matcher needs to see on a killmail to match it, None
+       if it isn't an entity matcher."""
+    if name not in _entity_matchers:
+        return None
+
+    key, sides = _entity_matchers[name]
+
+    return {(side, key, int(value)) for side in sides}
+
+
+# Where a killmail happened as ("name", lowercase name), ("security", band),
+# ("wspace",) or ("chain",)
+SystemKey = Tuple[str, ...]
+
+
+def _system_keys(name: str, value: Any) -> Optional[Set[SystemKey]]:
+    """The places a killmail needs to have happened in to match a matcher,
+       None if it isn't a location or security matcher."""
+    if name == "location":
+        if value in ("chain", "wspace"):
+            return {(value,)}
+
+        return {("name", str(value).lower())}
+
+    if name == "security":
+        band = _SECURITY.get(str(value).lower())
+        return {("security", band)} if band is not None else set()
+
+    return None
+
+
+def _static_system_keys(system: System) -> Set[SystemKey]:
+    """The places a system is, apart from our chains."""
+    keys: Set[SystemKey] = {("name", system.name.lower())}
+
+    if system.security is not None:
+        keys.add(("security", system.security))
+
+    if system.wspace:
+        keys.add(("wspace",))
+
+    return keys
+
+
+def _minimum_value(value: int) -> Predicate:
+    return lambda kill: bool(kill.package["zkb"]["totalValue"] >= value)
+
+
+# Every matcher by name, with how expensive it is to run relative to the
+# others and the function that compiles its configured value into a
+# Predicate
+compilers: Dict[str, Tuple[int, Callable[[Any], Predicate]]] = {
+    "minimum_value": (0, _minimum_value),
+    "alliance_loss": (1, _loss("alliance_id")),
+    "corporation_loss": (1, _loss("corporation_id")),
+    "character_loss": (1, _loss("character_id")),
+    "location": (2, _location),
+    "security": (2, _security_status),
+    "alliance": (3, _either("alliance_id")),
+    "corporation": (3, _either("corporation_id")),
+    "character": (3, _either("character_id")),
+    "alliance_kill": (3, _kill("alliance_id")),
+    "corporation_kill": (3, _kill("corporation_id")),
+    "character_kill": (3, _kill("character_id")),
+    "within_jumps": (4, _within_jumps),
+}
+
+
+def _matcher(name: str) -> Callable[..., Awaitable[bool]]:
+    """The asynchronous form of a matcher, compiling its value every time."""
+
+    async def matcher(
+        value: Any, package: Dict[str, Any], universe: Universe
+    ) -> bool:
+        return compilers[name][1](value)(Kill(package, universe))
+
+    matcher.__name__ = f"_match_{name}"
+
+    return matcher
+
+
+# XXX the async matchers are kept for compatibility, they compile their
+# value on every call so use a Filter instead
+_match_location = _matcher("location")
+_match_within_jumps = _matcher("within_jumps")
+_match_security_status = _matcher("security")
+_match_alliance = _matcher("alliance")
+_match_alliance_kill = _matcher("alliance_kill")
+_match_alliance_loss = _matcher("alliance_loss")
+_match_corporation = _matcher("corporation")
+_match_corporation_kill = _matcher("corporation_kill")
+_match_corporation_loss = _matcher("corporation_loss")
+_match_character = _matcher("character")
+_match_character_kill = _matcher("character_kill")
+_match_character_loss = _matcher("character_loss")
+_match_minimum_value = _matcher("minimum_value")
 
 # I gave up on trying to type this properly...
 matchers: Dict[str, Any] = {
     "location": _match_location,
+    "within_jumps": _match_within_jumps,
     "alliance": _match_alliance,
     "character": _match_character,
     "alliance_kill": _match_alliance_kill,
@@ -235,70 +585,240 @@ matchers: Dict[str, Any] = {
 }
 
 
-async def match_killmail(
-    config: Dict[str, Any], universe: Universe, package: Dict[str, Any]
-) -> List[Dict[str, Any]]:
+class Filter:
+    """The filter of a notifier compiled into a synchronous predicate on
+       killmails. Matchers run cheapest first within their section and the
+       sections with the cheapest matchers run first, the first one to
+       decide against the killmail stops the rest from running."""
 
-    """Filter a killmail with its set of notifier filters. Returns the notifier
-       if there's a match for it."""
+    # Section name and its compiled matchers, cheapest first
+    sections: List[Tuple[str, List[Predicate]]]
 
-    matches = []
+    # A killmail needs at least one of these entities on it to match, None
+    # if any killmail might
+    gate: Optional[FrozenSet[EntityKey]]
 
-    killmail_id = package["killmail"]["killmail_id"]
+    # A killmail needs to have happened in one of these places to match,
+    # None if it might have happened anywhere
+    system_gate: Optional[FrozenSet[SystemKey]]
 
-    # Now let's see if any kill notifiers' filters match
-    for index, notifier in enumerate(config["notifier"]):
-        log.debug(
-            "considering killmail id %s for notifier %s", killmail_id, index
-        )
-        if notifier["subscribes_to"] != "kill":
-            log.debug(
-                "notifier %s does not subscribe to kills; skipping", index
-            )
-            continue
+    def __init__(self, config: Dict[str, Any]) -> None:
+        sections = []
+
+        for section in (
+            "require_all_of",
+            "require_any_of",
+            "exclude_if_any",
+            "exclude_if_all",
+        ):
+            compiled = []
 
-        async def apply_matchers(section: str) -> List[bool]:
-            rv = []
-            for d in notifier.get("filter", {}).get(section, []):
+            for d in config.get(section, []):
                 for name, value in d.items():
-                    filter_result = await matchers[name](
-                        value, package, universe
-                    )
-                    log.debug(
-                        "notifier %s killmail %s: %s: considered %s(%s) --> %s",
-                        index,
-                        killmail_id,
+                    if name not in compilers:
+                        raise ValueError(f"unknown kill filter {name!r}")
+
+                    cost, compile = compilers[name]
+                    compiled.append((cost, compile(value)))
+
+            if compiled:
+                compiled.sort(key=lambda c: c[0])
+                sections.append(
+                    (
+                        sum(c for c, _ in compiled),
                         section,
-                        name,
-                        value,
-                        filter_result,
+                        [p for _, p in compiled],
                     )
-                    rv.append(filter_result)
-            return rv
-
-        sections: Dict[str, Callable[..., bool]] = {
-            "require_all_of": all,
-            "require_any_of": any,
-            "exclude_if_any": lambda x: not any(x),
-            "exclude_if_all": lambda x: not all(x),
-        }
+                )
 
-        rv = True
+        sections.sort(key=lambda s: s[0])
 
-        for section, aggregator in sections.items():
-            section_results = await apply_matchers(section)
-            rv = rv and (
-                len(section_results) == 0 or aggregator(section_results)
-            )
+        self.sections = [
+            (section, predicates) for _, section, predicates in sections
+        ]
 
-        if rv:
-            log.debug(
-                "notifier %s killmail %s: it's a match!", index, killmail_id
-            )
-            matches.append(notifier)
-        else:
-            log.debug(
-                "notifier %s killmail %s: filtered away", index, killmail_id
+        self.gate = self._gate(config, _entity_keys)
+        self.system_gate = self._gate(config, _system_keys)
+
+    @staticmethod
+    def _gate(
+        config: Dict[str, Any],
+        keys_of: Callable[[str, Any], Optional[Set[Any]]],
+    ) -> Optional[FrozenSet[Any]]:
+        """What a killmail needs to match according to the matchers that
+           `keys_of` gives keys for. Any such matcher that is required will
+           do, otherwise the matchers of require_any_of if they all have
+           keys."""
+        for d in config.get("require_all_of", []):
+            for name, value in d.items():
+                keys = keys_of(name, value)
+
+                if keys is not None:
+                    return frozenset(keys)
+
+        gate: Set[Any] = set()
+
+        for d in config.get("require_any_of", []):
+            for name, value in d.items():
+                keys = keys_of(name, value)
+
+                if keys is None:
+                    return None
+
+                gate.update(keys)
+
+        return frozenset(gate) or None
+
+    def __call__(self, kill: Kill) -> bool:
+        for section, predicates in self.sections:
+            if section == "require_all_of":
+                if not all(p(kill) for p in predicates):
+                    return False
+            elif section == "require_any_of":
+                if not any(p(kill) for p in predicates):
+                    return False
+            elif section == "exclude_if_any":
+                if any(p(kill) for p in predicates):
+                    return False
+            elif section == "exclude_if_all":
+                if all(p(kill) for p in predicates):
+                    return False
+
+        return True
+
+
+class KillMatcher:
+    """The filters of all kill notifiers in a configuration, compiled once
+       and used for every killmail.
+
+       Notifiers are indexed by where a killmail has to happen for them and
+       by the alliances, corporations or characters they need on it. Only
+       the filters of the notifiers the killmail can concern are run."""
+
+    notifiers: List[Tuple[Dict[str, Any], Filter]]
+
+    # The notifiers that can match any killmail, by index
+    _ungated: List[int]
+
+    # The notifiers that need an entity on the killmail, by index
+    _gated: Dict[EntityKey, List[int]]
+
+    # The notifiers that need a killmail to happen somewhere, by index
+    _located: Dict[SystemKey, List[int]]
+
+    # The notifiers that need both
+    _both: Set[int]
+
+    # The notifiers of `_located` each solar system concerns apart from
+    # those of our chains, filled as killmails come in
+    _systems: Dict[int, List[int]]
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        self.notifiers = [
+            (notifier, Filter(notifier.get("filter", {})))
+            for notifier in config.get("notifier", [])
+            if notifier["subscribes_to"] == "kill"
+        ]
+
+        self._ungated = []
+        self._gated = {}
+        self._located = {}
+        self._both = set()
+        self._systems = {}
+
+        for index, (_, predicate) in enumerate(self.notifiers):
+            if predicate.system_gate is not None:
+                for place in predicate.system_gate:
+                    self._located.setdefault(place, []).append(index)
+
+            if predicate.gate is not None:
+                for entity in predicate.gate:
+                    self._gated.setdefault(entity, []).append(index)
+
+            if predicate.system_gate is None:
+                if predicate.gate is None:
+                    self._ungated.append(index)
+            elif predicate.gate is not None:
+                self._both.add(index)
+
+    def _system(self, system: System) -> List[int]:
+        """The located notifiers a system concerns, apart from our chains."""
+        located = self._systems.get(system.identifier)
+
+        if located is None:
+            located = sorted(
+                {
+                    index
+                    for key in _static_system_keys(system)
+                    for index in self._located.get(key, [])
+                }
             )
+            self._systems[system.identifier] = located
+
+        return located
+
+    def candidates(self, kill: Kill) -> List[int]:
+        """The notifiers that might match a kill, by index."""
+        located: Set[int] = set()
+        gated: Set[int] = set()
+
+        if self._located:
+            system = kill.solar_system
+            located.update(self._system(system))
+
+            if ("chain",) in self._located and system in kill.universe.systems:
+                located.update(self._located[("chain",)])
+
+        if self._gated:
+            gathered = kill.entities
+
+            # Look up whichever of the two has less in it in the other
+            if len(gathered) < len(self._gated):
+                for entity in gathered:
+                    gated.update(self._gated.get(entity, ()))
+            else:
+                for entity, indices in self._gated.items():
+                    if entity in gathered:
+                        gated.update(indices)
+
+        if not located and not gated:
+            return self._ungated
+
+        # Notifiers with both kinds of needs must have both met
+        candidates = (located | gated) - (self._both - (located & gated))
+        candidates.update(self._ungated)
+
+        return sorted(candidates)
+
+    def match(
+        self, package: Dict[str, Any], universe: Universe
+    ) -> List[Dict[str, Any]]:
+        """The notifiers whose filter matches a killmail."""
+        kill = Kill(package, universe)
+        candidates = self.candidates(kill)
+
+        matches = [
+            self.notifiers[index][0]
+            for index in candidates
+            if self.notifiers[index][1](kill)
+        ]
+
+        log.debug(
+            "match: killmail %s matched %d of %d candidates of %d notifiers",
+            package["killmail"]["killmail_id"],
+            len(matches),
+            len(candidates),
+            len(self.notifiers),
+        )
+
+        return matches
+
+
+async def match_killmail(
+    config: Dict[str, Any], universe: Universe, package: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Filter a killmail with its set of notifier filters. Returns the notifier
+       if there's a match for it. This compiles the filters every time, keep a
+       KillMatcher around instead when matching more than one killmail."""
 
-    return matches
+    return KillMatcher(config).match(package, universe)
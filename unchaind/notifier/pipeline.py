@@ -0,0 +1,220 @@
+"""Process kills in stages that each have their own workers.
+
+A kill is fetched from RedisQ, parsed, matched against the notifiers,
+enriched with a payload for each notifier that matched and then delivered
+to its sink. The stats behind the payloads are gathered once per kill no
+matter how many notifiers it matched. Stages are connected by bounded
+queues, so a slow webhook only holds up other deliveries once the queue in
+front of it is full and the next poll doesn't wait for the previous kill to
+be posted."""
+import asyncio
+import logging
+
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+
+from unchaind.notifier.kill import (
+    RedisQ,
+    parse_killmail,
+    killmail_message,
+    KillMatcher,
+)
+from unchaind.universe import Multiverse
+from unchaind.util.kill import Enrichment
+from unchaind.sink import sinks
+
+
+log = logging.getLogger(__name__)
+
+# Notifier, package and payload for a single delivery
+Delivery = Tuple[Dict[str, Any], Dict[str, Any], Optional[Dict[str, Any]]]
+
+
+class Pipeline:
+    """The stages of kill processing and their workers. `workers` has the
+       number of workers for each of the stages fetch, parse, match, enrich
+       and deliver. `queue_size` is how many items can wait in front of each
+       stage before the one before it has to wait."""
+
+    STAGES = ("fetch", "parse", "match", "enrich", "deliver")
+
+    config: Dict[str, Any]
+    multiverse: Multiverse
+    redisq: RedisQ
+    matcher: KillMatcher
+
+    workers: Dict[str, int]
+    queues: Dict[str, "asyncio.Queue[Any]"]
+
+    _tasks: List["asyncio.Task[None]"]
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        multiverse: Multiverse,
+        redisq: RedisQ,
+        workers: Optional[Dict[str, int]] = None,
+        queue_size: int = 64,
+    ) -> None:
+        self.config = config
+        self.multiverse = multiverse
+        self.redisq = redisq
+        self.matcher = KillMatcher(config)
+
+        self.workers = {
+            "fetch": 1,
+            "parse": 1,
+            "match": 1,
+            "enrich": 4,
+            "deliver": 4,
+        }
+        self.workers.update(workers or {})
+
+        # The queue in front of each stage, fetch makes its own input
+        self.queues = {
+            stage: asyncio.Queue(maxsize=queue_size)
+            for stage in self.STAGES[1:]
+        }
+
+        self._tasks = []
+
+    @classmethod
+    def from_config(
+        cls, config: Dict[str, Any], multiverse: Multiverse
+    ) -> "Pipeline":
+        """Create a pipeline from the optional `pipeline` section of our
+           configuration."""
+        section = config.get("pipeline", {})
+
+        return cls(
+            config,
+            multiverse,
+            RedisQ.from_config(config),
+            workers={
+                stage: int(count)
+                for stage, count in section.get("workers", {}).items()
+                if stage in cls.STAGES
+            },
+            queue_size=int(section.get("queue_size", 64)),
+        )
+
+    def start(self) -> None:
+        """Start the workers of every stage."""
+        stages: Dict[str, Callable[[], Awaitable[None]]] = {
+            "fetch": self._fetch,
+            "parse": self._parse,
+            "match": self._match,
+            "enrich": self._enrich,
+            "deliver": self._deliver,
+        }
+
+        for stage in self.STAGES:
+            for _ in range(self.workers[stage]):
+                self._tasks.append(asyncio.ensure_future(stages[stage]()))
+
+        log.info(
+            "start: pipeline with %s",
+            ", ".join(f"{self.workers[s]} {s}" for s in self.STAGES),
+        )
+
+    async def stop(self) -> None:
+        """Stop all workers and close the RedisQ consumer, whatever is still
+           queued is dropped."""
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._tasks = []
+        self.redisq.close()
+
+    async def run(self) -> None:
+        """Start the workers and run until they are stopped."""
+        self.start()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def join(self) -> None:
+        """Wait until everything that was fetched so far went through all of
+           the stages."""
+        for stage in self.STAGES[1:]:
+            await self.queues[stage].join()
+
+    async def _fetch(self) -> None:
+        """Poll RedisQ forever. A failing poll is logged like a failing item
+           in the other stages, without the fetcher nothing else has work."""
+        while True:
+            try:
+                killmail_str = await self.redisq.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                log.exception("_fetch: poll failed: %s", err)
+                continue
+
+            if killmail_str is not None:
+                await self.queues["parse"].put(killmail_str)
+
+    async def _work(
+        self, stage: str, function: Callable[[Any], Awaitable[None]]
+    ) -> None:
+        """Take items from the queue of a stage forever. A failing item is
+           logged and doesn't take the worker down with it."""
+        queue = self.queues[stage]
+
+        while True:
+            item = await queue.get()
+
+            try:
+                await function(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                log.exception("_work: %s failed: %s", stage, err)
+            finally:
+                queue.task_done()
+
+    async def _parse(self) -> None:
+        async def parse(killmail_str: str) -> None:
+            package = parse_killmail(killmail_str)
+
+            if package is not None:
+                await self.queues["match"].put(package)
+
+        await self._work("parse", parse)
+
+    async def _match(self) -> None:
+        async def match(package: Dict[str, Any]) -> None:
+            self.multiverse.refresh_sync()
+
+            matches = self.matcher.match(package, self.multiverse)
+
+            if not matches:
+                return
+
+            enrichment = Enrichment(package, self.multiverse)
+
+            for notifier in matches:
+                await self.queues["enrich"].put((notifier, enrichment))
+
+        await self._work("match", match)
+
+    async def _enrich(self) -> None:
+        async def enrich(item: Tuple[Dict[str, Any], Enrichment]) -> None:
+            notifier, enrichment = item
+            payload = await enrichment.payload(notifier)
+
+            await self.queues["deliver"].put(
+                (notifier, enrichment.package, payload)
+            )
+
+        await self._work("enrich", enrich)
+
+    async def _deliver(self) -> None:
+        async def deliver(item: Delivery) -> None:
+            notifier, package, payload = item
+
+            await sinks[notifier["type"]](
+                notifier, killmail_message(package), payload=payload
+            )
+
+        await self._work("deliver", deliver)
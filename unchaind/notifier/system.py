@@ -1,6 +1,6 @@
 import logging
 
-from typing import Dict, Any, List, Callable
+from typing import Dict, Any, List, Callable, Optional
 from asyncio import gather
 
 from unchaind.util.connection import payload_for_connection
@@ -13,31 +13,47 @@ log = logging.getLogger(__name__)
 # Our own universe which is umpdated every now and then
 _universe: Universe = Universe.from_empty_sync()
 
+# The version of the multiverse our universe was last updated to
+_version: Optional[int] = None
 
-async def periodic(
-    config: Dict[str, Any], universes: Dict[str, Universe]
-) -> None:
+
+async def periodic(config: Dict[str, Any], multiverse: Multiverse) -> None:
     """Periodically compare our snapshot of the universe with all the universes
        in existence. Find deltas for new systems found."""
 
-    multiverse = await Multiverse.from_universes(*universes.values())
+    global _version
+
+    multiverse.refresh_sync()
+
+    if multiverse.version == _version:
+        log.debug("periodic: multiverse did not change")
+        return
+
+    delta: Optional[Delta] = None
 
     if len(_universe.systems) == 0:
         log.debug("periodic: universe is empty, fill")
     else:
-        delta = Delta.from_universes(_universe, multiverse)
+        if _version is not None:
+            delta = multiverse.changes_since(_version)
+
+        if delta is None:
+            delta = Delta.from_universes(_universe, multiverse)
 
         for connection in delta.connections_del:
             log.info("periodic: connection deleted %r", connection)
 
+        for connection in delta.connections_changed:
+            log.info("periodic: connection changed %r", connection)
+
         # Then let's see if there's any new connection
         for connection in delta.connections_add:
             log.info("periodic: new connection found %r", connection)
             matches = await match_connection(config, multiverse, connection)
 
             if not matches:
-                log.debug(f"periodic: no matches for %r", connection)
-                return
+                log.debug("periodic: no matches for %r", connection)
+                continue
 
             message = f"New connection found {connection}"
 
@@ -57,8 +73,14 @@ async def periodic(
             )
 
     # Now that we've processed the new connections we can update *our*
-    # univesre
-    await _universe.update_with(multiverse)
+    # univesre, with what we know changed if we can
+    if delta is None:
+        _universe.update_with_sync(multiverse)
+    else:
+        _universe.apply_sync(delta)
+        _universe.aliases = multiverse.aliases
+
+    _version = multiverse.version
 
 
 async def match_connection(
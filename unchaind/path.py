@@ -1,6 +1,30 @@
-from typing import List, Optional
+import heapq
+import importlib.util
+import time
 
-from unchaind.universe import Multiverse, System
+from collections import deque, OrderedDict
+from itertools import count
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Mapping,
+    Tuple,
+    Callable,
+    Deque,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    AbstractSet,
+    Set,
+    Any,
+    TYPE_CHECKING,
+)
+
+from unchaind.universe import Universe, Multiverse, System, Connection, State
+
+if TYPE_CHECKING:
+    import numpy
 
 
 class Path:
@@ -12,16 +36,31 @@ class Path:
 
     path: List[System]
     multiverse: Multiverse
+    cost: float
+
+    # The version of the multiverse this Path was found in
+    version: int
 
     def __init__(self) -> None:
         self.path = []
+        self.cost = 0.0
+        self.version = 0
 
     @classmethod
-    def from_path(cls, systems: List[System], multiverse: Multiverse) -> "Path":
+    def from_path(
+        cls,
+        systems: List[System],
+        multiverse: Multiverse,
+        cost: Optional[float] = None,
+    ) -> "Path":
+        """Create a Path from its systems. Without a cost the cost of a Path
+           is its number of jumps."""
         instance = cls()
 
         instance.path = systems
         instance.multiverse = multiverse
+        instance.cost = float(len(systems) - 1) if cost is None else cost
+        instance.version = multiverse.version
 
         return instance
 
@@ -38,19 +77,950 @@ class Path:
         return text
 
 
+def _walk(
+    parents: Dict[System, Optional[System]], system: System
+) -> List[System]:
+    """Follow parent pointers back to the start and return the systems from
+       the start to `system`."""
+    systems = []
+    current: Optional[System] = system
+
+    while current is not None:
+        systems.append(current)
+        current = parents[current]
+
+    systems.reverse()
+
+    return systems
+
+
 # XXX roll this into the Path class.
 def path(left: System, right: System, multiverse: Multiverse) -> Optional[Path]:
-    """Calculate a Path between two different Systems."""
+    """Calculate a Path between two different Systems. This is a breadth
+       first search so the Path has the least amount of jumps."""
     graph = multiverse.graph
-    queue = [(left, [left])]
+
+    if left not in graph or right not in graph:
+        return None
+
+    if left == right:
+        return Path.from_path([left], multiverse)
+
+    parents: Dict[System, Optional[System]] = {left: None}
+    queue = deque([left])
 
     while queue:
-        vertex, path = queue.pop(0)
+        vertex = queue.popleft()
+
+        for goto in graph[vertex]:
+            if goto in parents:
+                continue
+
+            parents[goto] = vertex
 
-        for goto in set(graph[vertex]) - set(path):
             if goto == right:
-                return Path.from_path(path + [goto], multiverse)
-            else:
-                queue.append((goto, path + [goto]))
+                return Path.from_path(_walk(parents, goto), multiverse)
+
+            queue.append(goto)
+
+    return None
+
+
+def _expand(
+    graph: Mapping[System, Mapping[System, Connection]],
+    frontier: List[System],
+    parents: Dict[System, Optional[System]],
+    distances: Dict[System, int],
+    others: Dict[System, int],
+) -> Tuple[List[System], Optional[System]]:
+    """Expand one whole level of a breadth first search. Returns the next
+       level and, if the other side of the search was reached, the system
+       where they meet with the shortest total distance."""
+    level: List[System] = []
+    meet: Optional[System] = None
+
+    for vertex in frontier:
+        for goto in graph[vertex]:
+            if goto in parents:
+                continue
+
+            parents[goto] = vertex
+            distances[goto] = distances[vertex] + 1
+
+            if goto in others and (
+                meet is None
+                or distances[goto] + others[goto]
+                < distances[meet] + others[meet]
+            ):
+                meet = goto
+
+            level.append(goto)
+
+    return level, meet
+
+
+def _bidirectional(
+    graph: Mapping[System, Mapping[System, Connection]],
+    left: System,
+    right: System,
+    avoid: Iterable[System] = (),
+) -> Optional[List[System]]:
+    """The systems of a shortest route between two different systems that
+       doesn't go through any of the systems to avoid, see
+       `bidirectional_path`."""
+    parents_left: Dict[System, Optional[System]] = {left: None}
+    parents_right: Dict[System, Optional[System]] = {right: None}
+
+    # Systems to avoid look like they were already seen from both sides
+    for system in avoid:
+        parents_left.setdefault(system, None)
+        parents_right.setdefault(system, None)
+
+    distances_left = {left: 0}
+    distances_right = {right: 0}
+
+    frontier_left = [left]
+    frontier_right = [right]
+
+    while frontier_left and frontier_right:
+        if len(frontier_left) <= len(frontier_right):
+            frontier_left, meet = _expand(
+                graph,
+                frontier_left,
+                parents_left,
+                distances_left,
+                distances_right,
+            )
+        else:
+            frontier_right, meet = _expand(
+                graph,
+                frontier_right,
+                parents_right,
+                distances_right,
+                distances_left,
+            )
+
+        if meet is not None:
+            systems = _walk(parents_left, meet)
+            systems.extend(reversed(_walk(parents_right, meet)[:-1]))
+
+            return systems
 
     return None
+
+
+def bidirectional_path(
+    left: System, right: System, multiverse: Multiverse
+) -> Optional[Path]:
+    """Calculate a Path between two different Systems by searching from both
+       ends at the same time until the searches meet, always growing the
+       smaller of the two. The Path has the least amount of jumps, as with
+       `path`, but far fewer systems are looked at on long routes."""
+    graph = multiverse.graph
+
+    if left not in graph or right not in graph:
+        return None
+
+    if left == right:
+        return Path.from_path([left], multiverse)
+
+    systems = _bidirectional(graph, left, right)
+
+    if systems is None:
+        return None
+
+    return Path.from_path(systems, multiverse)
+
+
+# A cost function gives the cost of jumping through a connection from one
+# system into another, or None if that jump isn't allowed at all. Costs must
+# not be negative.
+Cost = Callable[[Connection, System, System], Optional[float]]
+
+
+def cost_jumps(connection: Connection, prev: System, goto: System) -> float:
+    """Every jump costs the same."""
+    return 1.0
+
+
+def cost_avoid_end_of_life(
+    connection: Connection, prev: System, goto: System
+) -> float:
+    """Take a few extra jumps rather than an end of life or critical
+       connection."""
+    if connection.state.test_any(State.END_OF_LIFE | State.CRITICAL_MASS):
+        return 5.0
+
+    return 1.0
+
+
+def cost_prefer_highsec(
+    connection: Connection, prev: System, goto: System
+) -> float:
+    """Take a lot of extra jumps rather than go into low or null security
+       space."""
+    if goto.truesec >= 0.45:
+        return 1.0
+
+    return 10.0
+
+
+def cost_no_frigate(
+    connection: Connection, prev: System, goto: System
+) -> Optional[float]:
+    """Never use frigate sized connections, for anything bigger than a
+       frigate."""
+    if connection.state.frigate_sized:
+        return None
+
+    return 1.0
+
+
+def combine(*costs: Cost) -> Cost:
+    """Make a cost function that adds up the costs of others, each of them
+       counting a plain jump as 1. A jump any of them forbids is forbidden."""
+
+    def cost(
+        connection: Connection, prev: System, goto: System
+    ) -> Optional[float]:
+        total = 0.0
+
+        for function in costs:
+            value = function(connection, prev, goto)
+
+            if value is None:
+                return None
+
+            total += value - 1.0
+
+        return total + 1.0
+
+    return cost
+
+
+costs: Dict[str, Cost] = {
+    "jumps": cost_jumps,
+    "avoid_end_of_life": cost_avoid_end_of_life,
+    "prefer_highsec": cost_prefer_highsec,
+    "capital": combine(cost_no_frigate, cost_avoid_end_of_life),
+    "safe": combine(cost_avoid_end_of_life, cost_prefer_highsec),
+}
+
+
+def route(
+    left: System,
+    right: System,
+    multiverse: Multiverse,
+    cost: Cost = cost_jumps,
+) -> Optional[Path]:
+    """Calculate the cheapest Path between two Systems according to a cost
+       function, see `costs` for some. This is Dijkstra's algorithm on a
+       binary heap. When every jump costs the same this is a breadth first
+       search instead, see `bidirectional_path`."""
+    if cost is cost_jumps:
+        return bidirectional_path(left, right, multiverse)
+
+    graph = multiverse.graph
+
+    if left not in graph or right not in graph:
+        return None
+
+    parents: Dict[System, Optional[System]] = {left: None}
+    distances: Dict[System, float] = {left: 0.0}
+    done = set()
+
+    # Systems can't be compared, the counter breaks ties between equal
+    # distances
+    tiebreak = count()
+    heap: List[Tuple[float, int, System]] = [(0.0, next(tiebreak), left)]
+
+    while heap:
+        distance, _, vertex = heapq.heappop(heap)
+
+        if vertex in done:
+            continue
+
+        if vertex == right:
+            return Path.from_path(_walk(parents, vertex), multiverse, distance)
+
+        done.add(vertex)
+
+        for goto, connection in graph[vertex].items():
+            if goto in done:
+                continue
+
+            value = cost(connection, vertex, goto)
+
+            if value is None:
+                continue
+
+            value += distance
+
+            if value < distances.get(goto, value + 1.0):
+                distances[goto] = value
+                parents[goto] = vertex
+
+                heapq.heappush(heap, (value, next(tiebreak), goto))
+
+    return None
+
+
+RouteKey = Tuple[System, System, Cost]
+
+
+class RouteCache:
+    """Remember the most recently used routes of a multiverse. Asking for the
+       same route again costs a lookup until a connection on it disappears or
+       changes state, then it is searched again.
+
+       Routes that were found stay until then even when new connections
+       appear that would make them shorter, the version of a Path tells
+       which multiverse it was found in. Routes that didn't exist are
+       searched again whenever anything was added."""
+
+    multiverse: Multiverse
+    size: int
+    version: int
+
+    hits: int
+    misses: int
+    evictions: int
+
+    _entries: "OrderedDict[RouteKey, Optional[Path]]"
+
+    # The routes that go through each connection
+    _using: Dict[FrozenSet[System], Set[RouteKey]]
+
+    def __init__(self, multiverse: Multiverse, size: int = 256) -> None:
+        self.multiverse = multiverse
+        self.size = size
+        self.version = multiverse.version
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._using = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def route(
+        self, left: System, right: System, cost: Cost = cost_jumps
+    ) -> Optional[Path]:
+        """See `route`."""
+        self.refresh()
+
+        key = (left, right, cost)
+
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+            return self._entries[key]
+
+        self.misses += 1
+
+        found = route(left, right, self.multiverse, cost)
+
+        self._entries[key] = found
+
+        if found is not None:
+            for prev, goto in zip(found.path, found.path[1:]):
+                self._using.setdefault(frozenset([prev, goto]), set()).add(key)
+
+        while len(self._entries) > self.size:
+            self._evict(next(iter(self._entries)))
+
+        return found
+
+    def _evict(self, key: RouteKey) -> None:
+        found = self._entries.pop(key)
+        self.evictions += 1
+
+        if found is None:
+            return
+
+        for prev, goto in zip(found.path, found.path[1:]):
+            connection = frozenset([prev, goto])
+
+            self._using[connection].discard(key)
+
+            if not self._using[connection]:
+                del self._using[connection]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._using.clear()
+
+    def refresh(self) -> None:
+        """Forget the routes that changes to our multiverse broke."""
+        if self.version == self.multiverse.version:
+            return
+
+        delta = self.multiverse.changes_since(self.version)
+        self.version = self.multiverse.version
+
+        if delta is None:
+            self.clear()
+            return
+
+        broken: Set[RouteKey] = set()
+
+        for connection in delta.connections_del | delta.connections_changed:
+            broken.update(
+                self._using.get(
+                    frozenset([connection.left, connection.right]), ()
+                )
+            )
+
+        if delta.connections_add:
+            broken.update(k for k, v in self._entries.items() if v is None)
+
+        for key in broken:
+            self._evict(key)
+
+
+def cached_route(
+    left: System,
+    right: System,
+    multiverse: Multiverse,
+    cost: Cost = cost_jumps,
+) -> Optional[Path]:
+    """See `route`, through a RouteCache kept on the multiverse."""
+    return route_cache(multiverse).route(left, right, cost)
+
+
+def route_cache(multiverse: Multiverse) -> RouteCache:
+    """The RouteCache kept on a multiverse, for its counters."""
+    key = ("route_cache",)
+    cache: Optional[RouteCache] = multiverse._derived.get(key)
+
+    if cache is None:
+        cache = RouteCache(multiverse)
+        multiverse._derived[key] = cache
+
+    return cache
+
+
+def _cost_of(
+    systems: List[System], multiverse: Multiverse, cost: Cost
+) -> Optional[float]:
+    """The cost of following a list of systems, None if it can't be done."""
+    total = 0.0
+
+    for prev, goto in zip(systems, systems[1:]):
+        value = cost(multiverse.graph[prev][goto], prev, goto)
+
+        if value is None:
+            return None
+
+        total += value
+
+    return total
+
+
+class _Detour(Mapping[System, Mapping[System, Connection]]):
+    """A view of a graph without the jumps between one system and some of
+       its neighbors."""
+
+    graph: Mapping[System, Mapping[System, Connection]]
+    system: System
+    without: AbstractSet[System]
+
+    def __init__(
+        self,
+        graph: Mapping[System, Mapping[System, Connection]],
+        system: System,
+        without: AbstractSet[System],
+    ) -> None:
+        self.graph = graph
+        self.system = system
+        self.without = without
+
+    def __getitem__(self, system: System) -> Mapping[System, Connection]:
+        neighbors = self.graph[system]
+
+        if system == self.system:
+            return {
+                goto: connection
+                for goto, connection in neighbors.items()
+                if goto not in self.without
+            }
+
+        if system in self.without:
+            return {
+                goto: connection
+                for goto, connection in neighbors.items()
+                if goto != self.system
+            }
+
+        return neighbors
+
+    def __contains__(self, system: object) -> bool:
+        return system in self.graph
+
+    def __iter__(self) -> Iterator[System]:
+        return iter(self.graph)
+
+    def __len__(self) -> int:
+        return len(self.graph)
+
+
+def _detour(
+    multiverse: Multiverse,
+    left: System,
+    right: System,
+    avoid: AbstractSet[System],
+    without: AbstractSet[System],
+    cost: Cost,
+) -> Optional[Tuple[List[System], float]]:
+    """The cheapest route and its cost from `left` to `right` that doesn't go
+       through any of the systems to avoid and doesn't jump from `left` into
+       any of the systems in `without`."""
+    if cost is cost_jumps:
+        systems = _bidirectional(
+            _Detour(multiverse.graph, left, without), left, right, avoid
+        )
+
+        if systems is None:
+            return None
+
+        return systems, float(len(systems) - 1)
+
+    def detour_cost(
+        connection: Connection, prev: System, goto: System
+    ) -> Optional[float]:
+        if goto in avoid or (prev == left and goto in without):
+            return None
+
+        return cost(connection, prev, goto)
+
+    cheapest = route(left, right, multiverse, detour_cost)
+
+    if cheapest is None:
+        return None
+
+    return cheapest.path, cheapest.cost
+
+
+def alternatives(
+    left: System,
+    right: System,
+    multiverse: Multiverse,
+    k: int = 3,
+    cost: Cost = cost_jumps,
+    budget: float = 1.0,
+) -> List[Path]:
+    """Calculate up to `k` of the cheapest Paths between two Systems that
+       don't visit any system twice, cheapest first. This is Yen's
+       algorithm on top of `route`.
+
+       Each search for an alternative detours from a system of the previous
+       Path, the whole thing stops after `budget` seconds with the Paths
+       found so far. Complete results are kept until the multiverse
+       changes, results cut short by the budget are not kept."""
+    key = ("alternatives", left, right, k, cost)
+    cached = multiverse._derived.get(key)
+
+    if cached is not None and cached[0] == multiverse.version:
+        return list(cached[1])
+
+    deadline = time.monotonic() + budget
+    found: List[Path] = []
+
+    first = route(left, right, multiverse, cost)
+
+    if first is not None:
+        found.append(first)
+
+    seen = {tuple(p.path) for p in found}
+
+    tiebreak = count()
+    candidates: List[Tuple[float, int, List[System]]] = []
+
+    # Whether there are no more Paths to find than the ones we have
+    exhausted = not found
+
+    while found and len(found) < k and time.monotonic() < deadline:
+        previous = found[-1].path
+
+        for index in range(len(previous) - 1):
+            if time.monotonic() >= deadline:
+                break
+
+            root = previous[: index + 1]
+            spur = root[-1]
+
+            # Don't go back into the root and don't take the same next jump
+            # as any Path we already have with this root
+            rooted = set(root[:-1])
+            taken = {
+                p.path[index + 1] for p in found if p.path[: index + 1] == root
+            }
+
+            tail = _detour(multiverse, spur, right, rooted, taken, cost)
+
+            if tail is None:
+                continue
+
+            systems = root[:-1] + tail[0]
+
+            if tuple(systems) in seen:
+                continue
+
+            root_cost = _cost_of(root, multiverse, cost)
+
+            if root_cost is None:
+                continue
+
+            seen.add(tuple(systems))
+            heapq.heappush(
+                candidates, (root_cost + tail[1], next(tiebreak), systems)
+            )
+        else:
+            # Only once every detour of the previous Path was tried is the
+            # cheapest candidate certainly the next cheapest Path
+            if not candidates:
+                exhausted = True
+                break
+
+            total, _, systems = heapq.heappop(candidates)
+            found.append(Path.from_path(systems, multiverse, total))
+
+    # Drop whatever was kept for an older version of the multiverse
+    for other in [
+        o
+        for o, v in multiverse._derived.items()
+        if o[0] == "alternatives" and v[0] != multiverse.version
+    ]:
+        del multiverse._derived[other]
+
+    # A result cut short by the budget could be completed with more time
+    if exhausted or len(found) >= k:
+        multiverse._derived[key] = (multiverse.version, found)
+
+    return list(found)
+
+
+class Distances:
+    """The number of jumps from a set of source systems to every system that
+       can be reached from them in a multiverse, with the previous system on
+       a shortest route for each.
+
+       The table follows the changes of the multiverse when it is refreshed:
+       new connections are relaxed into it and only removing a connection
+       that a shortest route used makes it search again from scratch."""
+
+    multiverse: Multiverse
+    sources: FrozenSet[System]
+    version: int
+
+    distance: Dict[System, int]
+    parent: Dict[System, Optional[System]]
+
+    def __init__(
+        self, multiverse: Multiverse, sources: Iterable[System]
+    ) -> None:
+        self.multiverse = multiverse
+        self.sources = frozenset(sources)
+        self.version = multiverse.version
+
+        self.distance = {}
+        self.parent = {}
+
+        self._search()
+
+    def __getitem__(self, system: System) -> int:
+        return self.distance[system]
+
+    def __contains__(self, system: object) -> bool:
+        return system in self.distance
+
+    def get(self, system: System) -> Optional[int]:
+        """The number of jumps to a system, None if it can't be reached."""
+        return self.distance.get(system)
+
+    def path_to(self, system: System) -> Optional[Path]:
+        """A shortest Path from the nearest source to a system."""
+        if system not in self.distance:
+            return None
+
+        return Path.from_path(_walk(self.parent, system), self.multiverse)
+
+    def retarget(self, sources: Iterable[System]) -> None:
+        """Change the systems we measure from. New sources are relaxed into
+           the table, only when sources went away do we search again."""
+        sources = frozenset(sources)
+
+        if sources == self.sources:
+            return
+
+        removed = self.sources - sources
+        added = sources - self.sources
+
+        self.sources = sources
+
+        if removed:
+            self._search()
+            return
+
+        graph = self.multiverse.graph
+        queue: Deque[System] = deque()
+
+        for system in added:
+            if system in graph and self.distance.get(system) != 0:
+                self.distance[system] = 0
+                self.parent[system] = None
+
+                queue.append(system)
+
+        self._relax(queue)
+
+    def _search(self) -> None:
+        graph = self.multiverse.graph
+
+        self.distance = {s: 0 for s in self.sources if s in graph}
+        self.parent = {s: None for s in self.distance}
+
+        self._relax(deque(self.distance))
+
+    def _relax(self, queue: Deque[System]) -> None:
+        """Breadth first from the systems in the queue, lowering the distance
+           of every system that can be reached in fewer jumps through them."""
+        graph = self.multiverse.graph
+
+        while queue:
+            vertex = queue.popleft()
+            distance = self.distance[vertex] + 1
+
+            for goto in graph[vertex]:
+                if distance < self.distance.get(goto, distance + 1):
+                    self.distance[goto] = distance
+                    self.parent[goto] = vertex
+
+                    queue.append(goto)
+
+    def refresh(self) -> bool:
+        """Catch up with the changes of our multiverse, returns whether there
+           were any."""
+        if self.version == self.multiverse.version:
+            return False
+
+        delta = self.multiverse.changes_since(self.version)
+        self.version = self.multiverse.version
+
+        if delta is None or any(
+            self.parent.get(c.left) is c.right
+            or self.parent.get(c.right) is c.left
+            for c in delta.connections_del
+        ):
+            self._search()
+            return True
+
+        queue: Deque[System] = deque()
+
+        for connection in delta.connections_add:
+            for system in (connection.left, connection.right):
+                # A source can only appear once it has connections
+                if system in self.sources and system not in self.distance:
+                    self.distance[system] = 0
+                    self.parent[system] = None
+
+                if system in self.distance:
+                    queue.append(system)
+
+        self._relax(queue)
+
+        return True
+
+
+def distances(multiverse: Multiverse, sources: Iterable[System]) -> Distances:
+    """The up to date Distances from some systems in a multiverse. Tables
+       are kept around for each multiverse and set of sources so asking for
+       the same one again only costs the changes since the last time."""
+    sources = frozenset(sources)
+    key = ("distances", sources)
+    table: Optional[Distances] = multiverse._derived.get(key)
+
+    if table is None:
+        table = Distances(multiverse, sources)
+        multiverse._derived[key] = table
+    else:
+        table.refresh()
+
+    return table
+
+
+def chain_distances(universe: Universe) -> Distances:
+    """The up to date Distances from every system in a universe, usually
+       our chains, through the universe and the EVE stargates. The table
+       follows the universe as systems are added to or removed from it."""
+    if isinstance(universe, Multiverse):
+        universe.refresh_sync()
+
+    key = ("chain_distances",)
+    cached: Optional[Tuple[int, Distances]] = universe._derived.get(key)
+
+    # While the universe doesn't change neither do the distances, looking
+    # them up for a kill shouldn't cost more than that
+    if cached is not None and cached[0] == universe.version:
+        return cached[1]
+
+    routes = universe.with_eve()
+
+    if cached is None:
+        table = Distances(routes, universe.systems)
+    else:
+        table = cached[1]
+        table.refresh()
+        table.retarget(universe.systems)
+
+    universe._derived[key] = (universe.version, table)
+
+    return table
+
+
+def jumps_from_home(multiverse: Multiverse, system: System) -> Optional[int]:
+    """The number of jumps from the home system of a multiverse to a system,
+       through stargates and its chains. None when there is no home or no
+       way to get there."""
+    if multiverse.home is None:
+        return None
+
+    return distances(multiverse.with_eve(), [multiverse.home]).get(system)
+
+
+def have_numpy() -> bool:
+    """Whether NumPy is installed, without paying for importing it."""
+    return importlib.util.find_spec("numpy") is not None
+
+
+def _numpy() -> Any:
+    """NumPy, only imported once something needs it."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "ChainMatrix needs numpy, see unchaind[numpy]"
+        ) from None
+
+    return numpy
+
+
+class ChainMatrix:
+    """The number of jumps between every two systems of a universe over its
+       own connections, usually our chains, as a dense NumPy matrix. Row and
+       column `n` belong to `systems[n]`, systems that can't reach each other
+       are `UNREACHABLE` apart.
+
+       Chains are small enough that this is cheaper than searching each time
+       we want to know a distance between two of their systems. Needs NumPy,
+       install `unchaind[numpy]`."""
+
+    UNREACHABLE = -1
+
+    systems: List[System]
+    index: Dict[System, int]
+    matrix: "numpy.ndarray"
+    version: int
+
+    def __init__(self, universe: Universe) -> None:
+        numpy = _numpy()
+
+        graph = universe.graph
+
+        self.systems = sorted(graph, key=lambda s: s.identifier)
+        self.index = {system: row for row, system in enumerate(self.systems)}
+        self.version = universe.version
+
+        size = len(self.systems)
+
+        # Float matrices multiply through BLAS, integer ones don't. Counts of
+        # paths up to the size of a chain are exact in float32
+        adjacency = numpy.zeros((size, size), dtype=numpy.float32)
+
+        for system, neighbors in graph.items():
+            adjacency[
+                self.index[system], [self.index[goto] for goto in neighbors]
+            ] = 1
+
+        self.matrix = numpy.full(
+            (size, size), self.UNREACHABLE, dtype=numpy.int32
+        )
+        numpy.fill_diagonal(self.matrix, 0)
+
+        # A breadth first search from every system at once, each row of the
+        # frontier moves one jump further at every step
+        reached = numpy.eye(size, dtype=bool)
+        frontier = reached.astype(numpy.float32)
+        jumps = 0
+
+        while frontier.any():
+            jumps += 1
+
+            step = ((frontier @ adjacency) > 0) & ~reached
+
+            self.matrix[step] = jumps
+            reached |= step
+
+            frontier = step.astype(numpy.float32)
+
+    def __contains__(self, system: object) -> bool:
+        return system in self.index
+
+    def distance(self, left: System, right: System) -> Optional[int]:
+        """The number of jumps between two systems, None if they aren't both
+           in the matrix or can't reach each other."""
+        if left not in self.index or right not in self.index:
+            return None
+
+        jumps = int(self.matrix[self.index[left], self.index[right]])
+
+        return None if jumps == self.UNREACHABLE else jumps
+
+    def closest(
+        self, system: System, candidates: Optional[Iterable[System]] = None
+    ) -> Optional[Tuple[System, int]]:
+        """The closest system to a system and the number of jumps to it. Out
+           of some candidates if given, otherwise out of all other systems."""
+        if system not in self.index:
+            return None
+
+        numpy = _numpy()
+        row = self.index[system]
+
+        if candidates is None:
+            columns = numpy.delete(numpy.arange(len(self.systems)), row)
+        else:
+            columns = numpy.array(
+                [self.index[c] for c in candidates if c in self.index],
+                dtype=numpy.intp,
+            )
+
+        jumps = self.matrix[row, columns]
+        reachable = jumps != self.UNREACHABLE
+
+        if not reachable.any():
+            return None
+
+        columns = columns[reachable]
+        jumps = jumps[reachable]
+
+        best = int(jumps.argmin())
+
+        return self.systems[int(columns[best])], int(jumps[best])
+
+
+def chain_matrix(universe: Universe) -> ChainMatrix:
+    """The ChainMatrix of a universe as it is now. It is kept and only built
+       again once the universe changed."""
+    key = ("chain_matrix",)
+    matrix: Optional[ChainMatrix] = universe._derived.get(key)
+
+    if matrix is None or matrix.version != universe.version:
+        matrix = ChainMatrix(universe)
+        universe._derived[key] = matrix
+
+    return matrix
@@ -1,54 +1,425 @@
+"""Static universe data from the EVE SDE dumps in `data/`.
+
+Parsing the text dumps is slow enough to dominate startup so the parsed
+tables are compiled into a small binary cache, keyed by the hash of the
+text they were built from, which is read back with a single read on later
+starts. Set `UNCHAIND_CACHE_DIR` to choose where the cache lives or
+`UNCHAIND_NO_CACHE` to always parse the text dumps.
+
+Nothing is loaded on import. The system table and the stargate graph are
+each loaded on first use, long running processes can load them up front
+with `warm`."""
+import functools
+import hashlib
+import logging
 import os
+import struct
 
-from typing import Dict, List
+from array import array
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Callable,
+    Iterator,
+    Set,
+    Mapping,
+    TypeVar,
+)
 
 
-def load_systems() -> Dict[int, str]:
-    systems: Dict[int, str] = {}
+log = logging.getLogger(__name__)
 
-    with open(
-        os.path.join(os.path.dirname(__file__), "data", "system.txt")
-    ) as f:
-        for line in f:
-            a, b, _ = line.strip().split("|")
-            systems[int(a)] = b
+_DATA = os.path.join(os.path.dirname(__file__), "data")
 
-    return systems
+# Bump the version whenever the layout of the compiled tables changes, old
+# caches are then ignored and rewritten.
+_MAGIC = b"UNCD"
+_VERSION = 2
 
+# magic, version, sha256 of the source text, number of sections
+_HEADER = struct.Struct("<4sH32sH")
 
-def load_truesec() -> Dict[int, float]:
-    truesec: Dict[int, float] = {}
+# array typecode of the section and its length in bytes
+_SECTION = struct.Struct("<cI")
 
-    with open(
-        os.path.join(os.path.dirname(__file__), "data", "system.txt")
-    ) as f:
-        for line in f:
-            a, _, c = line.strip().split("|")
-            truesec[int(a)] = float(c)
+SystemTable = Tuple[array, List[str], array]
+ConnectionTable = Tuple[array, array]
 
-    return truesec
+K = TypeVar("K")
+V = TypeVar("V")
 
 
-def load_connections() -> Dict[int, List[int]]:
-    seen: List[frozenset] = []
-    connections: Dict[int, List[int]] = {}
+class LazyTable(Mapping[K, V]):
+    """A read-only mapping that is only loaded when it is first used."""
+
+    _load: Callable[[], Dict[K, V]]
+    _table: Optional[Dict[K, V]]
+
+    def __init__(self, load: Callable[[], Dict[K, V]]) -> None:
+        self._load = load
+        self._table = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._table is not None
+
+    def load(self) -> Dict[K, V]:
+        """Load the table if that didn't happen yet and return it."""
+        if self._table is None:
+            self._table = self._load()
+
+        return self._table
+
+    def __getitem__(self, key: K) -> V:
+        return self.load()[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.load()
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.load())
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+
+class Stargates:
+    """The stargate graph in compressed sparse row form. The neighbors of
+       the system at row `n` of `identifiers` are the system identifiers in
+       `neighbors[offsets[n]:offsets[n + 1]]`. Every connection is stored in
+       both directions."""
+
+    identifiers: array
+    offsets: array
+    neighbors: array
+
+    _rows: Dict[int, int]
+
+    def __init__(
+        self, identifiers: array, offsets: array, neighbors: array
+    ) -> None:
+        self.identifiers = identifiers
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+        self._rows = {
+            identifier: row for row, identifier in enumerate(identifiers)
+        }
+
+    @classmethod
+    def from_pairs(cls, lefts: array, rights: array) -> "Stargates":
+        """Build the graph from unique pairs of connected systems."""
+        degree: Dict[int, int] = {}
+
+        for a, b in zip(lefts, rights):
+            degree[a] = degree.get(a, 0) + 1
+            degree[b] = degree.get(b, 0) + 1
+
+        identifiers = array("i", sorted(degree))
+        offsets = array("i", [0]) * (len(identifiers) + 1)
+
+        for row, identifier in enumerate(identifiers):
+            offsets[row + 1] = offsets[row] + degree[identifier]
+
+        instance = cls(identifiers, offsets, array("i", [0]) * offsets[-1])
+
+        cursor = {
+            identifier: offsets[row]
+            for row, identifier in enumerate(identifiers)
+        }
+
+        for a, b in zip(lefts, rights):
+            instance.neighbors[cursor[a]] = b
+            cursor[a] += 1
+
+            instance.neighbors[cursor[b]] = a
+            cursor[b] += 1
+
+        return instance
+
+    def __len__(self) -> int:
+        return len(self.identifiers)
+
+    def __contains__(self, identifier: object) -> bool:
+        return identifier in self._rows
+
+    def neighbors_of(self, identifier: int) -> array:
+        """The systems directly connected to a system by stargate."""
+        row = self._rows.get(identifier)
+
+        if row is None:
+            return array("i")
+
+        return self.neighbors[self.offsets[row] : self.offsets[row + 1]]
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """Every connection once, with the lowest identifier on the left."""
+        for row, identifier in enumerate(self.identifiers):
+            for neighbor in self.neighbors[
+                self.offsets[row] : self.offsets[row + 1]
+            ]:
+                if identifier < neighbor:
+                    yield identifier, neighbor
+
+
+def _cache_path(name: str) -> Optional[str]:
+    """Where to keep the compiled version of a table, if anywhere."""
+    if os.environ.get("UNCHAIND_NO_CACHE"):
+        return None
+
+    directory = os.environ.get("UNCHAIND_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "unchaind",
+    )
+
+    return os.path.join(directory, f"{name}.bin")
+
+
+def _read_cache(
+    path: str, digest: bytes, typecodes: List[str]
+) -> Optional[List[array]]:
+    """Read the arrays of a compiled table. Returns None when there is no
+       usable cache for this digest and layout."""
+    try:
+        with open(path, "rb") as f:
+            blob = memoryview(f.read())
+    except OSError:
+        return None
+
+    try:
+        magic, version, key, count = _HEADER.unpack_from(blob)
+    except struct.error:
+        return None
+
+    if (
+        magic != _MAGIC
+        or version != _VERSION
+        or key != digest
+        or count != len(typecodes)
+    ):
+        return None
+
+    tables: List[array] = []
+    offset = _HEADER.size
+
+    for expected in typecodes:
+        try:
+            typecode, length = _SECTION.unpack_from(blob, offset)
+        except struct.error:
+            return None
+
+        offset += _SECTION.size
+        data = blob[offset : offset + length]
+
+        table = array(expected)
+
+        if typecode != expected.encode() or len(data) != length:
+            return None
+
+        if length % table.itemsize:
+            return None
+
+        table.frombytes(data)
+        tables.append(table)
+
+        offset += length
+
+    return tables
+
 
-    with open(
-        os.path.join(os.path.dirname(__file__), "data", "connection.txt")
-    ) as f:
-        for line in f:
-            a, b = line.strip().split("|")
+def _write_cache(
+    path: str, digest: bytes, sections: List[Tuple[str, bytes]]
+) -> None:
+    """Write the sections of a compiled table, atomically replacing any
+       previous version of it."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
 
-            if frozenset((a, b)) in seen:
-                continue
+        temporary = f"{path}.{os.getpid()}.tmp"
 
-            connections[int(a)] = connections.get(int(a), []) + [int(b)]
+        with open(temporary, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, digest, len(sections)))
 
-            seen.append(frozenset((a, b)))
+            for typecode, data in sections:
+                f.write(_SECTION.pack(typecode.encode(), len(data)))
+                f.write(data)
+
+        os.replace(temporary, path)
+    except OSError as err:
+        log.debug("_write_cache: could not write %s (%s)", path, err)
+
+
+def _compiled(
+    name: str,
+    source: str,
+    parse: Callable[[str], List[array]],
+    typecodes: List[str],
+) -> List[array]:
+    """Load the arrays of a table from its compiled cache, parsing and
+       compiling the text dump when the cache is missing or stale."""
+    with open(os.path.join(_DATA, source), "rb") as f:
+        text = f.read()
+
+    digest = hashlib.sha256(text).digest()
+    path = _cache_path(name)
+
+    if path is not None:
+        cached = _read_cache(path, digest, typecodes)
+
+        if cached is not None:
+            return cached
+
+    tables = parse(text.decode("utf-8"))
+
+    if path is not None:
+        _write_cache(
+            path,
+            digest,
+            [(table.typecode, table.tobytes()) for table in tables],
+        )
+
+    return tables
+
+
+def _parse_systems(text: str) -> List[array]:
+    identifiers = array("i")
+    names = array("B")
+    truesecs = array("d")
+
+    for line in text.splitlines():
+        a, b, c = line.strip().split("|")
+
+        identifiers.append(int(a))
+        truesecs.append(float(c))
+
+        names.frombytes(b.encode("utf-8") + b"\n")
+
+    return [identifiers, names, truesecs]
+
+
+def _parse_connections(text: str) -> List[array]:
+    seen: Set[Tuple[int, int]] = set()
+
+    lefts = array("i")
+    rights = array("i")
+
+    for line in text.splitlines():
+        a, b = map(int, line.strip().split("|"))
+
+        key = (a, b) if a < b else (b, a)
+
+        if key in seen:
+            continue
+
+        lefts.append(a)
+        rights.append(b)
+
+        seen.add(key)
+
+    stargates = Stargates.from_pairs(lefts, rights)
+
+    return [
+        lefts,
+        rights,
+        stargates.identifiers,
+        stargates.offsets,
+        stargates.neighbors,
+    ]
+
+
+def load_system_table() -> SystemTable:
+    """Load the identifiers, names and truesec of all systems as parallel
+       sequences."""
+    identifiers, names, truesecs = _compiled(
+        "system", "system.txt", _parse_systems, ["i", "B", "d"]
+    )
+
+    return (
+        identifiers,
+        names.tobytes().decode("utf-8").split("\n")[:-1],
+        truesecs,
+    )
+
+
+def _load_connection_arrays() -> List[array]:
+    return _compiled(
+        "connection",
+        "connection.txt",
+        _parse_connections,
+        ["i", "i", "i", "i", "i"],
+    )
+
+
+def load_connection_table(
+    arrays: Optional[List[array]] = None
+) -> ConnectionTable:
+    """Load all unique stargate connections as parallel sequences of the
+       systems on either side."""
+    lefts, rights, *_ = arrays or _load_connection_arrays()
+    return lefts, rights
+
+
+def load_stargates(arrays: Optional[List[array]] = None) -> Stargates:
+    """Load the stargate graph as compiled, without rebuilding it."""
+    _, _, identifiers, offsets, neighbors = (
+        arrays or _load_connection_arrays()
+    )
+    return Stargates(identifiers, offsets, neighbors)
+
+
+def load_systems(table: Optional[SystemTable] = None) -> Dict[int, str]:
+    identifiers, names, _ = table or load_system_table()
+    return dict(zip(identifiers, names))
+
+
+def load_truesec(table: Optional[SystemTable] = None) -> Dict[int, float]:
+    identifiers, _, truesecs = table or load_system_table()
+    return dict(zip(identifiers, truesecs))
+
+
+def load_connections(
+    arrays: Optional[List[array]] = None
+) -> Dict[int, List[int]]:
+    connections: Dict[int, List[int]] = {}
+
+    for a, b in zip(*load_connection_table(arrays)):
+        connections.setdefault(a, []).append(b)
 
     return connections
 
 
-systems: Dict[int, str] = load_systems()
-truesec: Dict[int, float] = load_truesec()
-connections: Dict[int, List[int]] = load_connections()
+@functools.lru_cache(maxsize=None)
+def system_table() -> SystemTable:
+    """The system table, loaded on first use."""
+    return load_system_table()
+
+
+@functools.lru_cache(maxsize=None)
+def _connection_arrays() -> List[array]:
+    return _load_connection_arrays()
+
+
+@functools.lru_cache(maxsize=None)
+def stargate_graph() -> Stargates:
+    """The stargate graph, loaded on first use."""
+    return load_stargates(_connection_arrays())
+
+
+def warm() -> None:
+    """Load every table now instead of on first use."""
+    systems.load()
+    truesec.load()
+    stargate_graph()
+
+
+systems: LazyTable[int, str] = LazyTable(
+    lambda: load_systems(system_table())
+)
+truesec: LazyTable[int, float] = LazyTable(
+    lambda: load_truesec(system_table())
+)
+connections: LazyTable[int, List[int]] = LazyTable(
+    lambda: load_connections(_connection_arrays())
+)
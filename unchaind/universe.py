@@ -1,42 +1,159 @@
 """Classes and types describing our Universe and the parts it consists of."""
 import logging
-
-from typing import Dict, Set, FrozenSet, List
-from itertools import chain
+import re
+
+from collections import deque
+from typing import (
+    AbstractSet,
+    Deque,
+    Dict,
+    Set,
+    FrozenSet,
+    List,
+    Mapping,
+    ClassVar,
+    Tuple,
+    Iterator,
+    Optional,
+    Union,
+    Any,
+    overload,
+)
 
 import unchaind.static as static
 
-from unchaind.exception import ConnectionDuplicate, ConnectionNonexistent
+from unchaind.exception import (
+    ConnectionDuplicate,
+    ConnectionNonexistent,
+    UniverseFrozen,
+)
 
 
 log = logging.getLogger(__name__)
 
 
+class _Flag:
+    """A single bit of `State.flags` exposed as a boolean attribute."""
+
+    __slots__ = ("mask",)
+
+    mask: int
+
+    def __init__(self, mask: int) -> None:
+        self.mask = mask
+
+    @overload
+    def __get__(self, instance: None, owner: type) -> "_Flag":
+        ...
+
+    @overload
+    def __get__(self, instance: "State", owner: type) -> bool:
+        ...
+
+    def __get__(
+        self, instance: Optional["State"], owner: type
+    ) -> Union["_Flag", bool]:
+        if instance is None:
+            return self
+
+        return bool(instance.flags & self.mask)
+
+    def __set__(self, instance: "State", value: bool) -> None:
+        instance.set(self.mask, value)
+
+
 class State:
     """A Connection can have a few states some of which can be there at the
-       same time."""
+       same time. The states are bits in a single integer so they can be
+       tested together with a mask such as
+       `State.WORMHOLE | State.END_OF_LIFE`."""
 
-    stargate: bool
-    wormhole: bool
-    jumpgate: bool
+    __slots__ = ("flags",)
 
-    critical_mass: bool
-    end_of_life: bool
-    frigate_sized: bool
+    STARGATE = 1 << 0
+    WORMHOLE = 1 << 1
+    JUMPGATE = 1 << 2
 
-    def __init__(self) -> None:
-        self.stargate = False
-        self.wormhole = False
-        self.jumpgate = False
+    CRITICAL_MASS = 1 << 3
+    END_OF_LIFE = 1 << 4
+    FRIGATE_SIZED = 1 << 5
+
+    flags: int
+
+    stargate = _Flag(STARGATE)
+    wormhole = _Flag(WORMHOLE)
+    jumpgate = _Flag(JUMPGATE)
+
+    critical_mass = _Flag(CRITICAL_MASS)
+    end_of_life = _Flag(END_OF_LIFE)
+    frigate_sized = _Flag(FRIGATE_SIZED)
 
-        self.critical_mass = False
-        self.frigate_sized = False
-        self.end_of_life = False
+    def __init__(self, flags: int = 0) -> None:
+        self.flags = flags
+
+    def test(self, mask: int) -> bool:
+        """Are all of the states in the mask set?"""
+        return self.flags & mask == mask
+
+    def test_any(self, mask: int) -> bool:
+        """Is any of the states in the mask set?"""
+        return bool(self.flags & mask)
+
+    def set(self, mask: int, value: bool = True) -> None:
+        """Set or clear all of the states in the mask."""
+        if value:
+            self.flags |= mask
+        else:
+            self.flags &= ~mask
+
+    def __int__(self) -> int:
+        return self.flags
+
+    def __hash__(self) -> int:
+        return self.flags
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, State):
+            return self.flags == other.flags
+
+        if isinstance(other, int):
+            return self.flags == other
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        names = [
+            name
+            for name, flag in vars(State).items()
+            if isinstance(flag, _Flag) and self.flags & flag.mask
+        ]
+
+        return f"State({'|'.join(names)})"
+
+
+def _type(flags: int) -> str:
+    if flags & State.STARGATE:
+        return "stargate"
+    elif flags & State.JUMPGATE:
+        return "jumpgate"
+    elif flags & State.WORMHOLE:
+        return "wormhole"
+
+    return ""
+
+
+# The type of a connection only depends on a few flags so we look it up
+_TYPE_MASK = State.STARGATE | State.WORMHOLE | State.JUMPGATE
+_TYPES: Dict[int, str] = {
+    flags: _type(flags) for flags in range(_TYPE_MASK + 1)
+}
 
 
 class Connection:
     """The Connection object describes two Systems linked together."""
 
+    __slots__ = ("left", "right", "state")
+
     left: "System"
     right: "System"
     state: State
@@ -51,34 +168,70 @@ class Connection:
 
     @property
     def type(self) -> str:
-        if self.state.stargate:
-            return "stargate"
-        elif self.state.jumpgate:
-            return "jumpgate"
-        elif self.state.wormhole:
-            return "wormhole"
+        return _TYPES[self.state.flags & _TYPE_MASK]
 
-        return ""
+
+# The names of wormhole systems
+_WSPACE = re.compile(r"J\d{6}")
 
 
 class System(object):
     """Represents a system from its identifier and name, can have a list of
-       of connections and belongs to a Universe."""
+       of connections and belongs to a Universe.
+
+       Systems are interned, there is only ever one System instance for each
+       identifier so creating one repeatedly is a dictionary lookup."""
+
+    __slots__ = ("identifier", "name", "truesec", "wspace", "security")
 
     identifier: int
     name: str
     truesec: float
 
-    def __init__(self, identifier: int) -> None:
-        self.identifier = identifier
-        self.name = static.systems[identifier]
-        self.truesec = static.truesec[identifier]
+    # Is this a wormhole system and its security band, one of "high", "low"
+    # and "null" or None for systems at exactly 0.0
+    wspace: bool
+    security: Optional[str]
+
+    _registry: ClassVar[Dict[int, "System"]] = {}
+
+    def __new__(cls, identifier: int) -> "System":
+        try:
+            return cls._registry[identifier]
+        except KeyError:
+            pass
+
+        instance = super().__new__(cls)
+
+        instance.identifier = identifier
+        instance.name = static.systems[identifier]
+        instance.truesec = static.truesec[identifier]
+
+        instance.wspace = bool(_WSPACE.match(instance.name))
+
+        if instance.truesec >= 0.45:
+            instance.security = "high"
+        elif instance.truesec > 0.0:
+            instance.security = "low"
+        elif instance.truesec < 0.0:
+            instance.security = "null"
+        else:
+            instance.security = None
+
+        return cls._registry.setdefault(identifier, instance)
+
+    def __reduce__(self) -> Tuple[type, Tuple[int]]:
+        """Make copies and unpickled Systems come from the registry too."""
+        return (self.__class__, (self.identifier,))
 
     def __hash__(self) -> int:
         """The identity of a System uses its identifier for uniqueness."""
         return self.identifier
 
     def __eq__(self, other) -> bool:  # type: ignore
+        if self is other:
+            return True
+
         return bool(self.identifier == other.identifier)
 
     def __repr__(self) -> str:
@@ -87,16 +240,56 @@ class System(object):
 
 class Universe:
     """Representation of a universe. A universe consists of a set of
-       connections and flattened connections into systems."""
+       connections and flattened connections into systems.
+
+       The flattened connections are kept up to date by `connect` and
+       `disconnect` so looking at the systems or the neighbors of a system
+       doesn't have to go over all connections. Always change `connections`
+       through those methods.
+
+       Every change to the connections increments `version`, so others can
+       cheaply tell whether a universe changed since they last looked. The
+       most recent changes are also kept in a log so `changes_since` can
+       tell them what changed in time proportional to the changes."""
 
     connections: Dict[FrozenSet[System], Connection]
     aliases: Dict[System, str]
+    version: int
+
+    _adjacency: Dict[System, Dict[System, Connection]]
+
+    # The change log holds (version, before, after) for the last `_LOG_SIZE`
+    # changes to a connection, everything up to `_trimmed` fell off the end.
+    # Before is None for a new connection and after is None for a removed
+    # one.
+    _LOG_SIZE = 8192
+
+    _log: Deque[Tuple[int, Optional[Connection], Optional[Connection]]]
+    _trimmed: int
+
+    # Ourselves on top of the EVE stargates, see `with_eve`
+    _with_eve: Optional["Multiverse"]
+
+    # Distance tables and routes kept for us by `unchaind.path`, they live as
+    # long as we do
+    _derived: Dict[Tuple[Any, ...], Any]
 
     def __init__(self,) -> None:
         self.aliases = {}
         self.connections = {}
+        self.version = 0
+
+        self._adjacency = {}
+
+        self._log = deque()
+        self._trimmed = 0
 
-    # XXX this is only async for consistency reasons
+        self._with_eve = None
+        self._derived = {}
+
+    # XXX the async methods of Universe are only async for consistency
+    # reasons, they are thin wrappers around their `_sync` counterparts
+    # which should be preferred in loops
     @classmethod
     async def from_empty(cls) -> "Universe":
         """Create an empty universe ready to be populated."""
@@ -110,24 +303,171 @@ class Universe:
     @classmethod
     async def from_eve(cls) -> "Universe":
         """Create a universe from EVE."""
+        return cls.from_eve_sync()
+
+    @classmethod
+    def from_eve_sync(cls) -> "Universe":
+        """Create a universe from EVE. All of its connections share the same
+           stargate State.
+
+           If you don't need to change it use the shared `Universe.eve`
+           instead."""
         instance = cls()
 
-        for left, rights in static.connections.items():
-            for right in rights:
-                state = State()
-                state.stargate = True
+        state = State(State.STARGATE)
+        stargates = static.stargate_graph()
+
+        connections = instance.connections
+        adjacency = instance._adjacency
 
-                await instance.connect(
-                    Connection(System(left), System(right), state)
-                )
+        # The graph is built in one go instead of through `connect`. Rows are
+        # sorted by identifier so a connection to a lower identifier was
+        # already created when that system's row was built.
+        for row, identifier in enumerate(stargates.identifiers):
+            system = System(identifier)
+            neighbors = adjacency[system] = {}
+
+            for other_identifier in stargates.neighbors[
+                stargates.offsets[row] : stargates.offsets[row + 1]
+            ]:
+                other = System(other_identifier)
+                key = frozenset([system, other])
+
+                if identifier < other_identifier:
+                    connection = connections[key] = Connection(
+                        system, other, state
+                    )
+                else:
+                    connection = connections[key]
+
+                neighbors[other] = connection
+
+        # There's no change log leading up to this
+        instance.version += 1
+        instance._trimmed = instance.version
+
+        return instance
+
+    @classmethod
+    def eve(cls) -> "Universe":
+        """The universe of EVE stargates shared by the whole process. It is
+           built on first use and can't be changed, overlay it with other
+           universes in a Multiverse."""
+        global _eve
+
+        if _eve is None:
+            _eve = FrozenUniverse.from_eve_sync()
+
+        return _eve
+
+    def with_eve(self) -> "Multiverse":
+        """This universe and the EVE stargates together, for routing. The
+           combined multiverse is kept and patched along with us so its
+           version only moves when we changed."""
+        if self._with_eve is None:
+            self._with_eve = Multiverse.from_universes_sync(
+                Universe.eve(), self
+            )
+        else:
+            self._with_eve.refresh_sync()
+
+        return self._with_eve
+
+    def connections_with(
+        self, include: int = 0, exclude: int = 0
+    ) -> Iterator[Connection]:
+        """All connections that have all of the states in `include` and none
+           of the states in `exclude`. For example the wormholes that aren't
+           end of life are
+           `connections_with(State.WORMHOLE, State.END_OF_LIFE)`."""
+        for connection in self.connections.values():
+            flags = connection.state.flags
+
+            if flags & include == include and not flags & exclude:
+                yield connection
+
+    def filtered(self, include: int = 0, exclude: int = 0) -> "Universe":
+        """A new universe with only the connections of `connections_with`."""
+        instance = Universe()
+        instance.aliases = self.aliases
+
+        for connection in self.connections_with(include, exclude):
+            instance._insert(
+                frozenset([connection.left, connection.right]), connection
+            )
 
         return instance
 
     @property
-    def systems(self) -> Set[System]:
-        return set(chain.from_iterable(self.connections))
+    def systems(self) -> AbstractSet[System]:
+        """All systems with at least one connection. This is a live view."""
+        return self._adjacency.keys()
+
+    def degree(self, system: System) -> int:
+        """The number of connections a system has in this universe."""
+        return len(self._adjacency.get(system, ()))
+
+    def _record(
+        self, before: Optional[Connection], after: Optional[Connection]
+    ) -> None:
+        self.version += 1
+
+        while len(self._log) >= self._LOG_SIZE:
+            self._trimmed = self._log.popleft()[0]
+
+        self._log.append((self.version, before, after))
+
+    def _reset(self) -> None:
+        """Forget all connections and the change log that led to them."""
+        self.connections = {}
+        self._adjacency = {}
+
+        self.version += 1
+
+        self._log.clear()
+        self._trimmed = self.version
+
+    def _insert(self, key: FrozenSet[System], connection: Connection) -> None:
+        self.connections[key] = connection
+        self._record(None, connection)
+
+        self._adjacency.setdefault(connection.left, {})[
+            connection.right
+        ] = connection
+        self._adjacency.setdefault(connection.right, {})[
+            connection.left
+        ] = connection
+
+    def _replace(self, key: FrozenSet[System], connection: Connection) -> None:
+        """Swap an existing connection for one with a different state."""
+        self._record(self.connections[key], connection)
+        self.connections[key] = connection
+
+        self._adjacency[connection.left][connection.right] = connection
+        self._adjacency[connection.right][connection.left] = connection
+
+    def _remove(self, key: FrozenSet[System]) -> None:
+        connection = self.connections.pop(key)
+        self._record(connection, None)
+
+        for system, other in (
+            (connection.left, connection.right),
+            (connection.right, connection.left),
+        ):
+            neighbors = self._adjacency.get(system)
+
+            if neighbors is None:
+                continue
+
+            neighbors.pop(other, None)
+
+            if not neighbors:
+                del self._adjacency[system]
 
     async def system_name(self, system: System) -> str:
+        return self.system_name_sync(system)
+
+    def system_name_sync(self, system: System) -> str:
         if system in self.aliases:
             return f"{self.aliases[system]} ({system.name})"
 
@@ -135,81 +475,296 @@ class Universe:
 
     async def connect(self, connection: Connection) -> None:
         """Add a connection as long as it doesn't exist."""
+        self.connect_sync(connection)
+
+    def connect_sync(self, connection: Connection) -> None:
+        """Add a connection as long as it doesn't exist."""
 
         key = frozenset([connection.left, connection.right])
 
         if key in self.connections:
             raise ConnectionDuplicate()
 
-        self.connections[key] = connection
+        self._insert(key, connection)
 
     async def disconnect(self, connection: Connection) -> None:
         """Delete a connection as long as it exist."""
+        self.disconnect_sync(connection)
+
+    def disconnect_sync(self, connection: Connection) -> None:
+        """Delete a connection as long as it exist."""
 
         key = frozenset([connection.left, connection.right])
 
         if key not in self.connections:
             raise ConnectionNonexistent()
 
-        del self.connections[key]
+        self._remove(key)
 
     async def update_with(self, universe: "Universe") -> None:
+        """See `update_with_sync`."""
+        self.update_with_sync(universe)
+
+    def update_with_sync(self, universe: "Universe") -> None:
         """Adjust this universe based on another universe adding all
            connections and removing those which aren't in the other
-           Universe.
+           Universe. Connections that exist in both but with a different
+           state take the state of the other Universe.
 
            This ignores nonexistent and filtered exceptions to make workflow
            as normal as possible."""
 
-        delta = Delta.from_universes(self, universe)
+        self.apply_sync(Delta.from_universes(self, universe))
+
+        if self.aliases != universe.aliases:
+            self.version += 1
+
+        self.aliases = universe.aliases
+
+    def apply_sync(self, delta: "Delta") -> None:
+        """Adjust this universe by the changes in a Delta, such as one from
+           `changes_since` of a universe this one is a copy of. Unlike
+           `update_with_sync` this only costs the changes."""
 
         for connection in delta.connections_add:
             try:
-                await self.connect(connection)
+                self.connect_sync(connection)
             except ConnectionNonexistent:
                 continue
 
         for connection in delta.connections_del:
             try:
-                await self.disconnect(connection)
+                self.disconnect_sync(connection)
             except ConnectionNonexistent:
                 continue
 
-        self.aliases = universe.aliases
+        for connection in delta.connections_changed:
+            self._replace(
+                frozenset([connection.left, connection.right]), connection
+            )
 
     @property
-    def graph(self) -> Dict[System, List[System]]:
+    def graph(self) -> Mapping[System, Mapping[System, Connection]]:
         """Return a flattened representation of only the systems and their
-           directly connected systems."""
+           directly connected systems, each neighbor maps to the connection
+           towards it. This is a live view, don't change it."""
 
-        flat: Dict[System, List[System]] = {}
+        return self._adjacency
 
-        # First pass
-        for key, connection in self.connections.items():
-            a, b = key
+    def changes_since(self, version: int) -> Optional["Delta"]:
+        """What changed in this universe after it was at `version`. Returns
+           None when the change log doesn't go back that far anymore, diff
+           against a copy with `Delta.from_universes` in that case."""
 
-            flat[a] = flat.get(a, []) + [connection.left, connection.right]
-            flat[b] = flat.get(b, []) + [connection.left, connection.right]
+        if version < self._trimmed or version > self.version:
+            return None
 
-            flat[a].remove(a)
-            flat[b].remove(b)
+        # What each changed connection was before and after, None if it
+        # didn't exist.
+        changes: Dict[
+            FrozenSet[System],
+            Tuple[Optional[Connection], Optional[Connection]],
+        ] = {}
 
-        return flat
+        # Going back from the newest change, the first change we see of a
+        # connection tells us what it is now and the last what it was.
+        for changed, before, after in reversed(self._log):
+            if changed <= version:
+                break
+
+            connection = before or after
+            assert connection is not None
+
+            key = frozenset([connection.left, connection.right])
+
+            if key in changes:
+                after = changes[key][1]
+
+            changes[key] = (before, after)
+
+        instance = Delta()
+
+        for before, after in changes.values():
+            if before is None and after is not None:
+                instance.connections_add.add(after)
+            elif before is not None and after is None:
+                instance.connections_del.add(before)
+            elif before is not None and after is not None:
+                if before.state != after.state:
+                    instance.connections_changed.add(after)
+
+        return instance
+
+
+class FrozenUniverse(Universe):
+    """A Universe that can't be changed after it was created."""
+
+    def _insert(self, key: FrozenSet[System], connection: Connection) -> None:
+        raise UniverseFrozen()
+
+    def _replace(self, key: FrozenSet[System], connection: Connection) -> None:
+        raise UniverseFrozen()
+
+    def _remove(self, key: FrozenSet[System]) -> None:
+        raise UniverseFrozen()
+
+    def update_with_sync(self, universe: "Universe") -> None:
+        raise UniverseFrozen()
+
+
+_eve: Optional[Universe] = None
 
 
 class Multiverse(Universe):
-    """Add multiple universes together into a single multiverse."""
+    """Add multiple universes together into a single multiverse.
+
+       A multiverse remembers the universes it was made from and the version
+       of each of them it last saw. `refresh` brings it up to date with its
+       members but only does any work when one of them actually changed, so
+       a multiverse can be kept around and refreshed before every use.
+
+       When multiple members have the same connection the first member
+       wins."""
+
+    members: List[Universe]
+
+    # The system our chains are mapped from, if we have one
+    home: Optional[System]
+
+    _versions: List[int]
+
+    # Which member each of our connections came from
+    _owners: Dict[FrozenSet[System], int]
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.members = []
+        self.home = None
+
+        self._versions = []
+        self._owners = {}
 
     @classmethod
     async def from_universes(cls, *universes: Universe) -> "Multiverse":
+        return cls.from_universes_sync(*universes)
+
+    @classmethod
+    def from_universes_sync(cls, *universes: Universe) -> "Multiverse":
         instance = cls()
+        instance.members = list(universes)
 
-        for universe in universes:
-            for connection in universe.connections.values():
-                await instance.connect(connection)
+        instance.refresh_sync()
 
         return instance
 
+    @property
+    def stale(self) -> bool:
+        """Did any of our members change since we last refreshed?"""
+        return self._versions != [m.version for m in self.members]
+
+    async def refresh(self) -> bool:
+        """See `refresh_sync`."""
+        return self.refresh_sync()
+
+    def refresh_sync(self) -> bool:
+        """Bring our connections up to date with our members if any of them
+           changed. Changes are patched in from the change log of members
+           and only when that isn't possible do we rebuild from scratch.
+           Returns whether anything was done."""
+
+        if not self.stale:
+            return False
+
+        if len(self._versions) != len(self.members):
+            self._rebuild()
+            return True
+
+        for index, universe in enumerate(self.members):
+            if self._versions[index] == universe.version:
+                continue
+
+            delta = universe.changes_since(self._versions[index])
+
+            if delta is None:
+                self._rebuild()
+                return True
+
+            self._patch(index, delta)
+            self._versions[index] = universe.version
+
+        return True
+
+    def with_eve(self) -> "Multiverse":
+        """See `Universe.with_eve`, we refresh ourselves first and the
+           combined multiverse shares our home."""
+        self.refresh_sync()
+
+        overlay = super().with_eve()
+        overlay.home = self.home
+
+        return overlay
+
+    def _rebuild(self) -> None:
+        self._reset()
+        self._owners = {}
+        self._versions = [m.version for m in self.members]
+
+        if not self.members:
+            return
+
+        # The first member always wins so we can copy it wholesale, which
+        # makes overlaying the large EVE universe cheap
+        first = self.members[0]
+
+        self.connections = dict(first.connections)
+        self._adjacency = {
+            system: dict(neighbors)
+            for system, neighbors in first._adjacency.items()
+        }
+        self._owners = dict.fromkeys(first.connections, 0)
+
+        for index, universe in enumerate(self.members[1:], 1):
+            for key, connection in universe.connections.items():
+                if key in self.connections:
+                    log.debug("refresh: duplicate connection %r", connection)
+                    continue
+
+                self._insert(key, connection)
+                self._owners[key] = index
+
+    def _patch(self, index: int, delta: "Delta") -> None:
+        """Apply the changes of one of our members."""
+
+        for connection in delta.connections_del:
+            key = frozenset([connection.left, connection.right])
+
+            if self._owners.get(key) != index:
+                continue
+
+            self._remove(key)
+            del self._owners[key]
+
+            # Another member might have had the same connection all along
+            for other, universe in enumerate(self.members):
+                if key in universe.connections:
+                    self._insert(key, universe.connections[key])
+                    self._owners[key] = other
+                    break
+
+        for connection in delta.connections_add | delta.connections_changed:
+            key = frozenset([connection.left, connection.right])
+            owner = self._owners.get(key)
+
+            if owner is None:
+                self._insert(key, connection)
+            elif owner >= index:
+                self._replace(key, connection)
+            else:
+                continue
+
+            self._owners[key] = index
+
 
 class Delta:
     """Represents the difference between two Universes with added, removed,
@@ -217,14 +772,18 @@ class Delta:
 
     connections_add: Set[Connection]
     connections_del: Set[Connection]
+    connections_changed: Set[Connection]
 
     def __init__(self) -> None:
         self.connections_add = set()
         self.connections_del = set()
+        self.connections_changed = set()
 
     @classmethod
     def from_universes(cls, left: Universe, right: Universe) -> "Delta":
-        """Build a Delta object from two Universes."""
+        """Build a Delta object from two Universes. Changed connections are
+           those in both Universes whose state differs, as they are on the
+           right."""
 
         instance = cls()
 
@@ -238,4 +797,9 @@ class Delta:
         ):
             instance.connections_del.add(left.connections[connection])
 
+        for key, changed in right.connections.items():
+            if key in left.connections:
+                if left.connections[key].state != changed.state:
+                    instance.connections_changed.add(changed)
+
         return instance
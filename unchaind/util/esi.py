@@ -2,7 +2,8 @@
 import logging
 import json
 
-from typing import Dict, Any
+from asyncio import gather
+from typing import Dict, Any, Iterable, List
 from async_lru import alru_cache
 
 from unchaind.http import HTTPSession
@@ -11,6 +12,13 @@ log = logging.getLogger(__name__)
 
 _ESI = "https://esi.evetech.net/latest/"
 
+# ESI resolves at most this many ids per request to /universe/names/
+_NAMES_CHUNK = 1000
+
+# Names resolve_names got from ESI for the name lookups below to take
+# instead of asking again, only kept until those took them
+_resolved: Dict[int, str] = {}
+
 
 @alru_cache(maxsize=8192)
 async def character_details(character: int) -> Dict[str, Any]:
@@ -36,9 +44,108 @@ async def type_details(type: int) -> Dict[str, Any]:
     return rv
 
 
+@alru_cache(maxsize=8192)
+async def character_name(character: int) -> str:
+    """The name of a character, resolved in bulk if that happened before."""
+    if character in _resolved:
+        return _resolved[character]
+
+    return str((await character_details(character))["name"])
+
+
+@alru_cache(maxsize=4096)
+async def type_name(type: int) -> str:
+    """The name of a type, resolved in bulk if that happened before."""
+    if type in _resolved:
+        return _resolved[type]
+
+    return str((await type_details(type))["name"])
+
+
+# The name lookups that keep what resolve_names finds, by ESI category
+_name_caches = {"character": character_name, "inventory_type": type_name}
+
+
+async def resolve_names(ids: Iterable[int]) -> Dict[int, str]:
+    """Resolve the names of many characters, types and other things at
+       once. Only ids we don't have a name for yet are sent to ESI, in as few
+       requests as it allows, and the names of characters and types fill the
+       caches of `character_name` and `type_name`. Ids that couldn't be
+       resolved are left out, looking them up one by one still works for
+       those."""
+    wanted = set(ids)
+    known = {
+        i: cached
+        for i in wanted
+        for cached in _name_caches.values()
+        if cached.cache_contains(i)
+    }
+
+    missing = sorted(wanted - set(known))
+    chunks = [
+        missing[n : n + _NAMES_CHUNK]
+        for n in range(0, len(missing), _NAMES_CHUNK)
+    ]
+
+    rv: Dict[int, str] = {}
+    fill: Dict[int, Any] = {}
+
+    for resolved in await gather(*[_names_request(c) for c in chunks]):
+        for entry in resolved:
+            identifier, name = int(entry["id"]), str(entry["name"])
+
+            rv[identifier] = name
+
+            if entry.get("category") in _name_caches:
+                _resolved[identifier] = name
+                fill[identifier] = _name_caches[entry["category"]]
+
+    # Looking the new names up stores them in the caches without a request,
+    # the ones we knew already are taken from there
+    lookups = {**known, **fill}
+
+    try:
+        names = await gather(
+            *[cached(i) for i, cached in lookups.items()],
+            return_exceptions=True,
+        )
+    finally:
+        for identifier in fill:
+            _resolved.pop(identifier, None)
+
+    rv.update(
+        (i, name) for i, name in zip(lookups, names) if isinstance(name, str)
+    )
+
+    return rv
+
+
+async def _names_request(ids: List[int]) -> List[Dict[str, Any]]:
+    http = HTTPSession()
+
+    try:
+        response = await http.request(
+            url=f"{_ESI}universe/names/", method="POST", body=json.dumps(ids)
+        )
+    except Exception as e:
+        log.warning("_names_request: failed to resolve names (%s)", e)
+        return []
+
+    # ESI refuses the whole request when it doesn't know one of the ids
+    if response.code != 200:
+        log.warning(
+            "_names_request: ESI answered %d for %d ids",
+            response.code,
+            len(ids),
+        )
+        return []
+
+    return list(json.loads(response.body))
+
+
 async def _esi_request(url: str) -> Dict[str, Any]:
     http = HTTPSession()
 
     response = await http.request(url=url, method="GET")
 
-    return dict(json.loads(response.body, encoding="utf-8"))
+    return dict(json.loads(response.body))
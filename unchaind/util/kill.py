@@ -1,11 +1,13 @@
 """Functions to extract data from killmail JSON dicts."""
+import asyncio
+import json
 import logging
 import dateutil.parser
 import millify
 import collections
 import operator
 
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, Tuple, Set
 
 from asyncio import gather
 from tornado.gen import multi
@@ -13,7 +15,8 @@ from tornado.gen import multi
 from dataclasses import dataclass
 
 import unchaind.util.esi as esi_util
-from unchaind.universe import Universe, System
+from unchaind.universe import Universe, Multiverse, System
+from unchaind.path import jumps_from_home
 
 log = logging.getLogger(__name__)
 
@@ -24,13 +27,13 @@ async def char_name_with_ticker(char: Dict[str, Any]) -> str:
 
     try:
         if "character_id" in char:
-            details, entity = await gather(
+            name, entity = await gather(
                 *[
-                    esi_util.character_details(char["character_id"]),
+                    esi_util.character_name(char["character_id"]),
                     entity_ticker_for_char(char),
                 ]
             )
-            return f"{details['name']} [{entity}]"
+            return f"{name} [{entity}]"
         elif "corporation_id" in char:
             # Some kills (e.g. POS modules) have no char id, but
             # still belong to a corp/alliance
@@ -85,6 +88,7 @@ class KillmailStats:
     isk_value: int
     solar_system_id: int
     solar_system_name: str
+    jumps_from_home: Optional[int] = None
 
     def zkb_url(self) -> str:
         return f"https://zkillboard.com/kill/{self.kill_id}/"
@@ -96,63 +100,73 @@ class KillmailStats:
         return str(millify.millify(self.isk_value, precision=2))
 
 
+def _names_for_killmail(package: Dict[str, Any]) -> Set[int]:
+    """The ids of the characters we name on a killmail, the victim and who
+       got the final blow and did the most damage, and of all ships on it.
+       ESI can resolve the names of those in bulk."""
+    victim = package["killmail"]["victim"]
+    attackers = package["killmail"].get("attackers", [])
+
+    chars = [victim]
+
+    if attackers:
+        chars.extend(x for x in attackers if x.get("final_blow"))
+        chars.append(max(attackers, key=lambda x: x.get("damage_done", 0)))
+
+    ids = {int(c["character_id"]) for c in chars if "character_id" in c}
+    ids.update(
+        int(c["ship_type_id"])
+        for c in [victim] + list(attackers)
+        if "ship_type_id" in c
+    )
+
+    return ids
+
+
 async def stats_for_killmail(
     package: Dict[str, Any], universe: Universe
 ) -> Optional[KillmailStats]:
 
     try:
-        victim_ship_typeid: int = int(
-            package["killmail"]["victim"]["ship_type_id"]
+        victim = package["killmail"]["victim"]
+        attackers = package["killmail"]["attackers"]
+
+        # Resolve all names in a few requests instead of one per attacker,
+        # while the tickers that can't be resolved in bulk are looked up.
+        # The lookups below then find all of them already resolved.
+        _, _, *tickers = await gather(
+            esi_util.resolve_names(_names_for_killmail(package)),
+            entity_ticker_for_char(victim),
+            *[entity_ticker_for_char(x) for x in attackers],
         )
+
+        victim_ship_typeid: int = int(victim["ship_type_id"])
         solar_system_id: int = int(package["killmail"]["solar_system_id"])
 
         d = {
-            "victim_moniker": char_name_with_ticker(
-                package["killmail"]["victim"]
-            ),
-            "victim_ship": esi_util.type_details(victim_ship_typeid),
+            "victim_moniker": char_name_with_ticker(victim),
+            "victim_ship": esi_util.type_name(victim_ship_typeid),
             "final_blow_moniker": char_name_with_ticker(
-                next(
-                    filter(
-                        lambda x: x["final_blow"],
-                        package["killmail"]["attackers"],
-                    )
-                )
+                next(filter(lambda x: x["final_blow"], attackers))
             ),
             "top_damage_moniker": char_name_with_ticker(
-                max(
-                    package["killmail"]["attackers"],
-                    key=lambda x: x["damage_done"],
-                )
-            ),
-            "attacker_entities": gather(
-                *[
-                    entity_ticker_for_char(x)
-                    for x in package["killmail"]["attackers"]
-                ]
+                max(attackers, key=lambda x: x["damage_done"])
             ),
             "attacker_ships": gather(
-                *[
-                    (esi_util.type_details(x["ship_type_id"]))
-                    for x in package["killmail"]["attackers"]
-                ]
+                *[esi_util.type_name(x["ship_type_id"]) for x in attackers]
             ),
             "solar_system_name": universe.system_name(System(solar_system_id)),
         }
 
         d = await multi(d)
 
-        d["victim_ship"] = d["victim_ship"]["name"]
         d["attacker_entities_summary"] = _stringify_counter_by_popularity(
-            collections.Counter(d["attacker_entities"])
+            collections.Counter(tickers)
         )
         d["attacker_ships_summary"] = _stringify_counter_by_popularity(
-            collections.Counter(
-                map(operator.itemgetter("name"), d["attacker_ships"])
-            )
+            collections.Counter(d["attacker_ships"])
         )
 
-        d.pop("attacker_entities", None)
         d.pop("attacker_ships", None)
 
         d["timestamp"] = int(
@@ -165,6 +179,11 @@ async def stats_for_killmail(
         d["isk_value"] = package["zkb"]["totalValue"]
         d["solar_system_id"] = solar_system_id
 
+        if isinstance(universe, Multiverse):
+            d["jumps_from_home"] = jumps_from_home(
+                universe, System(solar_system_id)
+            )
+
         return KillmailStats(**d)
     except Exception as e:
         log.exception(e)
@@ -172,20 +191,16 @@ async def stats_for_killmail(
     return None
 
 
-async def _slack_payload_for_killmail(
-    notifier: Dict[str, Any], package: Dict[str, Any], universe: Universe
-) -> Optional[Dict[str, Any]]:
-
-    stats = await stats_for_killmail(package, universe)
-
-    if not stats:
-        log.warn("_slack_payload_for_killmail: failed to aquire stats")
-        return None
-
+def _slack_payload(
+    notifier: Dict[str, Any], stats: KillmailStats
+) -> Dict[str, Any]:
     text = f"{stats.victim_moniker} lost a {stats.victim_ship} "
     text += f"worth {stats.pretty_isk_value()} ISK "
     text += f"\nin *{stats.solar_system_name}* "
 
+    if stats.jumps_from_home is not None:
+        text += f"({stats.jumps_from_home} jumps from home) "
+
     rv = {
         "attachments": [
             {
@@ -230,20 +245,16 @@ async def _slack_payload_for_killmail(
         )
 
     return rv
-async def _discord_payload_for_killmail(
-    notifier: Dict[str, Any], package: Dict[str, Any], universe: Universe
-) -> Optional[Dict[str, Any]]:
-
-    stats = await stats_for_killmail(package, universe)
-
-    if not stats:
-        log.warn("_discord_payload_for_killmail: failed to aquire stats")
-        return None
-
+def _discord_payload(
+    notifier: Dict[str, Any], stats: KillmailStats
+) -> Dict[str, Any]:
     text = f"{stats.victim_moniker} lost a {stats.victim_ship} "
     text += f"worth {stats.pretty_isk_value()} ISK "
     text += f"\nin *{stats.solar_system_name}* "
 
+    if stats.jumps_from_home is not None:
+        text += f"({stats.jumps_from_home} jumps from home) "
+
     rv = {
         "embeds": [
             {
@@ -279,7 +290,82 @@ async def _discord_payload_for_killmail(
 
     return rv
 
+
+async def _slack_payload_for_killmail(
+    notifier: Dict[str, Any], package: Dict[str, Any], universe: Universe
+) -> Optional[Dict[str, Any]]:
+    return await Enrichment(package, universe).payload(notifier)
+
+
+async def _discord_payload_for_killmail(
+    notifier: Dict[str, Any], package: Dict[str, Any], universe: Universe
+) -> Optional[Dict[str, Any]]:
+    return await Enrichment(package, universe).payload(notifier)
+
+
+render_payload: Dict[
+    str, Callable[[Dict[str, Any], KillmailStats], Dict[str, Any]]
+] = {"slack": _slack_payload, "discord": _discord_payload}
+
 payload_for_killmail: Dict[str, Callable] = {
     "slack": _slack_payload_for_killmail,
     "discord": _discord_payload_for_killmail
 }
+
+
+class Enrichment:
+    """The stats of a single killmail and the payloads rendered from them.
+       Stats are only gathered once a notifier needs a payload and are then
+       shared by every notifier the killmail matched. Payloads are rendered
+       once for each sink type and set of output options."""
+
+    package: Dict[str, Any]
+    universe: Universe
+
+    _stats: Optional["asyncio.Future[Optional[KillmailStats]]"]
+    _payloads: Dict[Tuple[str, str], Optional[Dict[str, Any]]]
+
+    def __init__(self, package: Dict[str, Any], universe: Universe) -> None:
+        self.package = package
+        self.universe = universe
+
+        self._stats = None
+        self._payloads = {}
+
+    async def stats(self) -> Optional[KillmailStats]:
+        """The stats of the killmail, gathered on first use."""
+        if self._stats is None:
+            self._stats = asyncio.ensure_future(
+                stats_for_killmail(self.package, self.universe)
+            )
+
+        # One waiter being cancelled shouldn't cancel it for the others
+        return await asyncio.shield(self._stats)
+
+    async def payload(
+        self, notifier: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """The payload for a notifier, None for sinks that don't take one or
+           when the stats couldn't be gathered. The same payload is handed
+           to every notifier of a type with the same output options so it
+           must not be changed."""
+        render = render_payload.get(notifier["type"])
+
+        if render is None:
+            return None
+
+        key = (
+            notifier["type"],
+            json.dumps(notifier.get("output") or {}, sort_keys=True),
+        )
+
+        if key not in self._payloads:
+            stats = await self.stats()
+
+            if stats is None:
+                log.warn("payload: failed to aquire stats")
+                self._payloads[key] = None
+            else:
+                self._payloads.setdefault(key, render(notifier, stats))
+
+        return self._payloads[key]